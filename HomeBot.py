@@ -10,46 +10,64 @@ from logging.handlers import RotatingFileHandler
 from telegram import Update, Document
 from langdetect import detect
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler,filters
 
-from src.service.DBService import init_db, store_message, get_last_messages, save_user_context, get_user_context
+from src.service.DBService import init_db, get_context_cache_stats
+from src.service.AsyncDBService import (store_message, get_last_messages, save_user_context, get_user_context,
+                                        save_context_chunk, get_context_sources, get_context_chunk, shutdown as shutdown_db)
 from src.service.YTService import get_video_id, fetch_transcript
-from src.service.LLMService import summarize_text,generate_response, select_model, escape_markdown, clean_and_trim_text
-from src.service.CredentialsService import get_credential
-from src.service.FIleService import extract_text, is_valid_url
+from src.service.LLMService import (generate_response, select_model, escape_markdown, clean_and_trim_text_async,
+                                   warm_up_resources, shutdown_text_workers, stream_response, stream_summary, format_summary,
+                                   close_llm_clients, cached_stream, response_cache_key)
+from src.service.CredentialsService import get_credential, install_reload_signal
+from src.service.RetrievalService import invalidate_index, select_context
+from src.service.FIleService import extract_text, is_valid_url, browser_pool, close_http_client, shutdown_pdf_workers
 
-# Ensure logs directory exists
-os.makedirs("logs", exist_ok=True)
-
-# Main logger
 logger = logging.getLogger("HomeBotLogger")
-logger.setLevel(logging.DEBUG)  # Capture everything, handlers will filter
-
-# Formatter
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-# Info Handler
-info_handler = RotatingFileHandler("logs/homebot.log", maxBytes=1_000_000, backupCount=3,encoding='utf-8')
-info_handler.setLevel(logging.INFO)
-info_handler.setFormatter(formatter)
-logger.addHandler(info_handler)
-
-# Debug Handler (separate file)
-debug_handler = RotatingFileHandler("logs/homebot.debug.log", maxBytes=1_000_000, backupCount=2,encoding='utf-8')
-debug_handler.setLevel(logging.DEBUG)
-debug_handler.setFormatter(formatter)
-logger.addHandler(debug_handler)
-
-# Optional: also log to console
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+
+
+def setup_logging():
+    """
+    Attach the log file handlers. Called from main() only: spawn-based worker processes
+    (PDF extraction, text cleaning) import this module again, and must not rotate the same files.
+    """
+    # Ensure logs directory exists
+    os.makedirs("logs", exist_ok=True)
+
+    # Main logger, without the console fallback LLMService adds when imported first
+    logger.handlers.clear()
+    logger.setLevel(logging.DEBUG)  # Capture everything, handlers will filter
+
+    # Formatter
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    # Info Handler
+    info_handler = RotatingFileHandler("logs/homebot.log", maxBytes=1_000_000, backupCount=3,encoding='utf-8')
+    info_handler.setLevel(logging.INFO)
+    info_handler.setFormatter(formatter)
+    logger.addHandler(info_handler)
+
+    # Debug Handler (separate file)
+    debug_handler = RotatingFileHandler("logs/homebot.debug.log", maxBytes=1_000_000, backupCount=2,encoding='utf-8')
+    debug_handler.setLevel(logging.DEBUG)
+    debug_handler.setFormatter(formatter)
+    logger.addHandler(debug_handler)
+
+    # Optional: also log to console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+
 # Store user language preference in memory
 
 
 MAX_MESSAGE_LENGTH = 4096
 MAX_DIALOG_CTXT = 50  #TODO add command to regulate this
+PDF_SPILL_THRESHOLD = 20 * 1024 * 1024  # larger uploads are downloaded to disk instead of memory
+STREAM_EDIT_INTERVAL = 0.5  # seconds between edits of a streamed answer, Telegram throttles frequent edits
 YOUTUBE_REGEX = r"""(?x)
     ^(?:https?://)?          # optional scheme
     (?:www\.)?               # optional www
@@ -62,9 +80,6 @@ YOUTUBE_REGEX = r"""(?x)
 """
 
 
-# Usage
-TOKEN = get_credential("TG_TOKEN")
-
 def contains_cyrillic(text):
     return bool(re.search('[\u0400-\u04FF]', text))
 
@@ -83,21 +98,25 @@ def safe_detect(text: str) -> str:
     except Exception:
         return "en"
 
-def append_to_context(new_text: str, user_id: int) -> str:
-    user_context = get_user_context(user_id)
-    if user_context and user_context.get("continue_context"):
-        return (user_context.get("transcript") or "") + "\n" + new_text
-    return new_text
+async def save_content(user_id: int, new_text: str, new_title: str, language: str = None):
+    """Save extracted text as a context chunk, after the already saved ones when context continuation is on."""
+    user_context = await get_user_context(user_id)
+    append = bool(user_context and user_context.get("continue_context"))
+    title = (user_context.get("title") or "") + "\n" + new_title if append else new_title
+
+    await save_context_chunk(user_id, new_text, source=new_title, append=append)
+    await save_user_context(user_id, title=title, language=language)
 
+    # The retrieval index is rebuilt by the next /qc, not on every save: appending stays O(new chunk)
+    invalidate_index(user_id)
 
-def append_to_title(new_title: str, user_id: int) -> str:
-    user_context = get_user_context(user_id)
-    if user_context and user_context.get("continue_context"):
-        return (user_context.get("title") or "") + "\n" + new_title
-    return new_title
+async def get_user_model(user_id: int):
+    """LLM backend chosen with /select_model, None for the default one."""
+    user_context = await get_user_context(user_id)
+    return user_context["model"] if user_context else None
 
-def get_context_from_dialog(user_id, max_dialog_contex: int = MAX_DIALOG_CTXT) -> str:
-    messages = get_last_messages(user_id, limit=max_dialog_contex)
+async def get_context_from_dialog(user_id, max_dialog_contex: int = MAX_DIALOG_CTXT) -> str:
+    messages = await get_last_messages(user_id, limit=max_dialog_contex)
     formatted = []
 
     for msg, is_from_user in messages:
@@ -106,6 +125,22 @@ def get_context_from_dialog(user_id, max_dialog_contex: int = MAX_DIALOG_CTXT) -
 
     return "\n".join(formatted)
 
+async def download_pdf_text(document: Document) -> str:
+    """Extract a PDF straight from memory; only files above PDF_SPILL_THRESHOLD go through a temp file."""
+    file = await document.get_file()
+
+    if (document.file_size or 0) <= PDF_SPILL_THRESHOLD:
+        data = await file.download_as_bytearray()
+        return await extract_text(bytes(data))
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        await file.download_to_drive(custom_path=tmp_path)
+        return await extract_text(tmp_path)
+    finally:
+        os.unlink(tmp_path)
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     message = update.message
@@ -125,7 +160,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # YouTube link check
         if re.search(YOUTUBE_REGEX, text):
             logger.debug(f"Detected YouTube link from {user.id}")
-            store_message(user.id, text)
+            await store_message(user.id, text)
             return await ts_command(update, context)
 
         # Web URL check
@@ -137,13 +172,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 context_data["language"] = safe_detect(extracted_text)
                 await message.reply_text("✅ Web page content saved for processing.")
 
-                save_user_context(
-                    user.id,
-                    transcript=append_to_context(context_data['transcript'], user.id),
-                    title=append_to_title(context_data['title'], user.id),
-                    language=context_data['language']
-                )
-                store_message(user.id, text)
+                await save_content(user.id, context_data['transcript'], context_data['title'], context_data['language'])
+                await store_message(user.id, text)
             except Exception as e:
                 logger.exception(f"Error extracting from URL: {e}")
                 await message.reply_text("❌ Failed to extract content from the URL.")
@@ -152,36 +182,27 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # PDF document handling
     if document and document.file_name.lower().endswith(".pdf"):
         try:
-            file = await document.get_file()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                await file.download_to_drive(custom_path=tmp_file.name)
-                extracted_text = await extract_text(tmp_file.name)
-                context_data["transcript"] = extracted_text
-                context_data["title"] = document.file_name
-                context_data["language"] = safe_detect(extracted_text)
-                await message.reply_text("✅ PDF content saved for processing.")
+            extracted_text = await download_pdf_text(document)
+            context_data["transcript"] = extracted_text
+            context_data["title"] = document.file_name
+            context_data["language"] = safe_detect(extracted_text)
+            await message.reply_text("✅ PDF content saved for processing.")
 
-                save_user_context(
-                    user.id,
-                    transcript=append_to_context(context_data['transcript'], user.id),
-                    title=append_to_title(context_data['title'], user.id),
-                    language=context_data['language']
-                )
+            await save_content(user.id, context_data['transcript'], context_data['title'], context_data['language'])
 
         except Exception as e:
             logger.exception(f"Error extracting from PDF: {e}")
             await message.reply_text("❌ Failed to extract content from the PDF.")
-        finally:
-            if 'tmp_file' in locals() and os.path.exists(tmp_file.name):
-                os.unlink(tmp_file.name)
         return
     lang = safe_detect(text)
     # Fallback response
 
-    context = get_context_from_dialog(user.id)
-    response = await generate_response(text or "", context or "", "", lang)
-    store_message(user.id, text)
-    store_message(user.id, response,'N')
+    use_cache = not context.user_data.pop("nocache", False)
+    context = await get_context_from_dialog(user.id)
+    response = await generate_response(text or "", context or "", "", lang, use_cache=use_cache, user_id=user.id,
+                                       model=await get_user_model(user.id))
+    await store_message(user.id, text)
+    await store_message(user.id, response,'N')
 
     await message.reply_text(response, parse_mode=ParseMode.MARKDOWN_V2)
 
@@ -198,6 +219,50 @@ def split_message(text, max_length=MAX_MESSAGE_LENGTH):
     chunks.append(text)
     return chunks
 
+async def stream_reply(message, pieces, finish) -> str:
+    """
+    Show an answer while it is generated: `message` is edited with the text so far, at most every
+    STREAM_EDIT_INTERVAL seconds, and finally replaced by finish(answer) sent as MarkdownV2.
+    Returns the formatted answer.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    parts, next_edit, first_shown = [], 0.0, None
+    async for piece in pieces:
+        parts.append(piece)
+        if loop.time() < next_edit:
+            continue
+        preview = "".join(parts)
+        if not preview.strip():
+            continue
+        if len(preview) > MAX_MESSAGE_LENGTH:
+            preview = "…" + preview[-(MAX_MESSAGE_LENGTH - 1):]
+        try:
+            await message.edit_text(preview)  # plain text: a half-written answer may not be valid Markdown
+        except RetryAfter as e:
+            wait = e.retry_after
+            next_edit = loop.time() + (wait.total_seconds() if hasattr(wait, "total_seconds") else wait)
+            continue
+        except BadRequest as e:
+            logger.debug(f"Streamed edit skipped: {e}")
+        if first_shown is None:
+            first_shown = loop.time() - started
+            logger.info(f"First tokens shown after {first_shown * 1000:.0f} ms")
+        next_edit = loop.time() + STREAM_EDIT_INTERVAL
+
+    result = finish("".join(parts) or "⚠️ No response from model.")
+    chunks = split_message(result)
+    try:
+        await message.edit_text(chunks[0], parse_mode=ParseMode.MARKDOWN_V2)
+    except BadRequest as e:
+        # A one-piece answer (cache hit, error line) may already be shown exactly like this by the preview
+        if "not modified" not in str(e).lower():
+            raise
+    for chunk in chunks[1:]:
+        await message.reply_text(chunk, parse_mode=ParseMode.MARKDOWN_V2)
+    logger.info(f"Streamed answer done after {(loop.time() - started) * 1000:.0f} ms, {len(result)} chars")
+    return result
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     text = "Hi!"
@@ -210,7 +275,7 @@ async def sl_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lang = context.args[0].lower()
 
         # Save only the language, keep transcript/title as is
-        save_user_context(user.id, language=lang)
+        await save_user_context(user.id, language=lang)
 
         reply = f"Language set to '{lang}'."
         await update.message.reply_text(reply)
@@ -225,7 +290,7 @@ async def ts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     user_id = user.id
 
-    messages = get_last_messages(user_id, 10, 'Y')
+    messages = await get_last_messages(user_id, 10, 'Y')
 
     yt_url = None
     for msg in reversed(messages):  # Search from most recent
@@ -252,13 +317,13 @@ async def ts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Get user language from context DB or fallback
-    context_data = get_user_context(user_id)
+    context_data = await get_user_context(user_id)
     lang = context_data["language"] if context_data and context_data.get("language") else "en"
 
     msg_start = await update.message.reply_text("⏳ Fetching transcript...")
     logger.info(f"User {user_id} ({user.username}) requested transcript for video '{video_id}' with lang '{lang}'")
 
-    result = fetch_transcript(video_id, lang)
+    result = await fetch_transcript(video_id, lang)
     logger.debug(result)
 
 
@@ -286,11 +351,7 @@ async def ts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = result.get('text')
     if is_valid_transcript(result):
         # Save context to DB
-        save_user_context(
-            user_id,
-            transcript=append_to_context(result['text'], user_id),
-            title=append_to_title(result['title'], user_id)
-        )
+        await save_content(user_id, result['text'], result['title'])
         await update.message.reply_text("✅ Ready to process")
     else:
         logger.warning(f"Transcript invalid or missing. Result: {result}")
@@ -316,33 +377,43 @@ async def cc_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(escape_markdown("❌ Invalid value. Use `y` or `n`."), parse_mode=ParseMode.MARKDOWN_V2)
         return
 
-    save_user_context(user_id, continue_context=(value == "y"))
+    await save_user_context(user_id, continue_context=(value == "y"))
     await update.message.reply_text(f"🔁 Continue context set to: `{value}`", parse_mode=ParseMode.MARKDOWN_V2)
 
+async def nocache_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # One-shot: only the user's next model request skips the response cache (and refreshes it)
+    context.user_data["nocache"] = True
+    await update.message.reply_text("🔄 Your next request will ask the model again instead of using the cache.")
+
 async def get_context(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     logger.info(f"User {user.id} ({user.username}) requested context text")
 
-    context_data = get_user_context(user.id)
+    sources = await get_context_sources(user.id)
 
-    if not context_data or not context_data.get("transcript"):
+    if not sources:
         await update.message.reply_text("❌ No context found")
         logger.info(f"No context found for user {user.id}")
         return
 
-    transcript = context_data["transcript"]
+    # Load and send one saved source at a time instead of the whole concatenated transcript
+    total_length = 0
+    for seq, source, length in sources:
+        content = await get_context_chunk(user.id, seq)
+        if not content:
+            continue
+        for chunk in split_message(content):
+            await update.message.reply_text(chunk)
+        total_length += length
 
-    for chunk in split_message(transcript):
-        await update.message.reply_text(chunk)
-
-    logger.info(f"Context sent to user {user.id} ({user.username}), length {len(transcript)} chars")
+    logger.info(f"Context sent to user {user.id} ({user.username}), length {total_length} chars")
 
 
 async def get_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     logger.info(f"User {user.id} ({user.username}) requested title text")
 
-    context_data = get_user_context(user.id)
+    context_data = await get_user_context(user.id)
 
     if not context_data or not context_data.get("title"):
         await update.message.reply_text("❌ No title found")
@@ -360,7 +431,7 @@ async def sum_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Also support optional lang override in /sm (e.g. /sm en)
     lang_override = context.args[0].lower() if context.args else None
     if lang_override:
-        save_user_context(update.message.from_user.id, language=lang_override)
+        await save_user_context(update.message.from_user.id, language=lang_override)
     return await generate_summary(update, context, "sum", -1)
 
 async def sup_sum_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -374,7 +445,7 @@ async def sup_sum_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             lang_override = arg.lower()
 
     if lang_override:
-        save_user_context(update.message.from_user.id, language=lang_override)
+        await save_user_context(update.message.from_user.id, language=lang_override)
 
     return await generate_summary(update, context, "sup_sum", max_answer_len)
 
@@ -385,7 +456,7 @@ async def generate_summary(update: Update, context: ContextTypes.DEFAULT_TYPE, q
 
     msg_start = await update.message.reply_text("⏳ Generating summary...")
 
-    context_data = get_user_context(user.id)
+    context_data = await get_user_context(user.id)
     if context_data is None:
         await update.message.reply_text("⚠️ No previous video context found. Use /transcript first.")
         return
@@ -394,32 +465,34 @@ async def generate_summary(update: Update, context: ContextTypes.DEFAULT_TYPE, q
     title = context_data["title"] or "Unknown Title"
     lang = context_data["language"] or "en"
 
-    context_text, check, tokem_len = clean_and_trim_text(context_text, lang)
+    context_text, check, tokem_len = await clean_and_trim_text_async(context_text, lang)
 
     if check:
-        await update.message.reply_text(f"⚠️ Input context too long - {tokem_len}. Result may be truncated...")
-
-    result = await summarize_text(context_text,title, lang, q_type, max_answer_len)
-    await msg_start.delete()
+        await msg_start.edit_text(f"⏳ Long context ({tokem_len} tokens), summarizing it in parts...")
 
-    store_message(user.id, result, 'N')
+    model = context_data["model"]
+    key = response_cache_key(q_type, lang, context_text, max_len=max_answer_len, model=model)
+    answer = cached_stream(key, stream_summary(context_text, lang, q_type, max_answer_len, tokem_len, user.id, model),
+                           use_cache=not context.user_data.pop("nocache", False))
+    result = await stream_reply(msg_start, answer, lambda text: format_summary(title, text))
 
-    for chunk in split_message(result):
-        await update.message.reply_text(chunk,parse_mode=ParseMode.MARKDOWN_V2)
+    await store_message(user.id, result, 'N')
     logger.info(f"Summary sent to user {user.id} ({user.username}), length {len(result)} chars")
 
 async def sel_model_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        await update.message.reply_text("⚠️ Usage: /model <gpt|local>")
+        await update.message.reply_text("⚠️ Usage: /select_model <gpt-4|local>")
         return
 
-    model_name = context.args[0].lower()
-
     try:
-        select_model(model_name)
-        await update.message.reply_text(f"✅ Model switched to *{model_name}*", parse_mode=ParseMode.MARKDOWN_V2)
+        model_name = select_model(context.args[0].lower())
     except ValueError:
-        await update.message.reply_text("❌ Invalid model. Please choose `gpt` or `local`.", parse_mode=ParseMode.MARKDOWN_V2)
+        await update.message.reply_text("❌ Invalid model\\. Please choose `gpt-4` or `local`\\.", parse_mode=ParseMode.MARKDOWN_V2)
+        return
+
+    # Stored per user: other users keep their own model
+    await save_user_context(update.message.from_user.id, model=model_name)
+    await update.message.reply_text(f"✅ Model switched to *{escape_markdown(model_name)}*", parse_mode=ParseMode.MARKDOWN_V2)
 
 # /q <question>
 async def question_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -429,17 +502,19 @@ async def question_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     question = " ".join(context.args)
-    context_data = get_user_context(user.id)
+    context_data = await get_user_context(user.id)
 
     context_text = context_data["transcript"]
     title = context_data["title"] or "Unknown Title"
     lang = context_data["language"] or "en"
 
-    context = get_context_from_dialog(user.id)
-    response = await generate_response(question, context, title, lang)
+    use_cache = not context.user_data.pop("nocache", False)
+    context = await get_context_from_dialog(user.id)
+    response = await generate_response(question, context, title, lang, use_cache=use_cache, user_id=user.id,
+                                       model=context_data["model"])
 
-    store_message(user.id, question)
-    store_message(user.id, response, 'N')
+    await store_message(user.id, question)
+    await store_message(user.id, response, 'N')
 
     await update.message.reply_text(response,parse_mode=ParseMode.MARKDOWN_V2)
 
@@ -455,7 +530,7 @@ async def question_with_context(update: Update, context: ContextTypes.DEFAULT_TY
     question = " ".join(context.args)
 
     try:
-        context_data = get_user_context(user_id)
+        context_data = await get_user_context(user_id)
         if context_data is None:
             await update.message.reply_text("⚠️ No previous video context found. Use /transcript first.")
             return
@@ -465,13 +540,17 @@ async def question_with_context(update: Update, context: ContextTypes.DEFAULT_TY
         lang = context_data["language"] or "en"
 
         msg_start = await update.message.reply_text("⏳ Asking context...")
-        response = await generate_response(question, context_text, title, lang,"?c")
-        await msg_start.delete()
-
-        store_message(user.id, question)
-        store_message(user.id, response, 'N')
-
-        await update.message.reply_text(response,parse_mode=ParseMode.MARKDOWN_V2)
+        # Only the passages relevant to the question are sent, not the whole saved context
+        passages = await asyncio.to_thread(select_context, user_id, question, context_text or "", lang)
+        logger.info(f"/qc for user {user_id}: {len(passages)} of {len(context_text or '')} context chars sent")
+        model = context_data["model"]
+        answer = cached_stream(response_cache_key("?c", lang, passages, question, model=model),
+                               stream_response(question, passages, lang, "?c", user_id=user_id, model=model),
+                               use_cache=not context.user_data.pop("nocache", False))
+        response = await stream_reply(msg_start, answer, escape_markdown)
+
+        await store_message(user.id, question)
+        await store_message(user.id, response, 'N')
     except KeyError as e:
         await update.message.reply_text("⚠️ No previous video context found. Use /transcript first.")
 
@@ -486,16 +565,42 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /show – Show the last saved transcript  
 /sm – Summarize the last saved transcript  
 /ssm [max_len] [lang] – Super summarize with optional max length and response language (e.g. `/ssm 300 ru`)  
-/select_model <gpt-4|local> – Switch between GPT or local model  
+/select_model <gpt-4|local> – Switch your own requests between GPT and the local model  
 /q <question> – Ask a general question (no video context)  
 /qc <question> – Ask a question using saved context  
 /cc <y|n> – Enable or disable *context continuation* (e.g. `/cc y`)  
+/nocache – Ask the model again on your next request instead of reusing a cached answer  
 """
     await update.message.reply_text(escape_markdown(help_text), parse_mode=ParseMode.MARKDOWN_V2)
     logger.info(f"User {update.message.from_user.id} used /help")
 
+async def on_startup(application):
+    # Launch the shared headless browser once, instead of on the first URL a user sends.
+    # It is only a fallback for pages plain HTTP can't read, so the bot starts without it;
+    # BrowserPool.page() tries the launch again when a page needs it.
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        logger.warning(f"Headless browser not available at startup: {e}")
+    # Encoders and stopwords are loaded once here rather than by the first /sm
+    await asyncio.to_thread(warm_up_resources)
+
+async def on_shutdown(application):
+    stats = get_context_cache_stats()
+    lookups = stats["hits"] + stats["misses"]
+    logger.info(f"User context cache: {stats['hits']}/{lookups} hits, {stats['entries']} entries, "
+                f"{stats['bytes'] / 1024:.0f} KB, {stats['evictions']} evictions")
+    await browser_pool.stop()
+    await close_http_client()
+    shutdown_pdf_workers()
+    shutdown_text_workers()
+    await close_llm_clients()
+
 def main():
-    application = ApplicationBuilder().token(TOKEN).build()
+    setup_logging()
+    # Credentials are read here, not at import, so tools importing HomeBot don't need config.json
+    install_reload_signal()
+    application = ApplicationBuilder().token(get_credential("TG_TOKEN")).post_init(on_startup).post_shutdown(on_shutdown).build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("sl", sl_command))
@@ -503,6 +608,7 @@ def main():
     application.add_handler(CommandHandler("gt", get_title))
     application.add_handler(CommandHandler("gc", get_context))
     application.add_handler(CommandHandler("cc", cc_command))
+    application.add_handler(CommandHandler("nocache", nocache_command))
     application.add_handler(CommandHandler("sm", sum_command))
     application.add_handler(CommandHandler("ssm", sup_sum_command))
     application.add_handler(CommandHandler("help", help_command))
@@ -514,6 +620,7 @@ def main():
 
     print("Bot started...")
     application.run_polling()
+    shutdown_db()
 
 if __name__ == "__main__":
     init_db()
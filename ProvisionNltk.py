@@ -0,0 +1,12 @@
+# provision_nltk.py
+import sys
+from src.service.LLMService import provision_nltk_data, NLTK_RESOURCES
+
+if __name__ == "__main__":
+    # Optional target directory, NLTK's default data directory otherwise
+    download_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    if provision_nltk_data(download_dir):
+        print(f"✅ NLTK data installed: {', '.join(NLTK_RESOURCES)}")
+    else:
+        print("❌ NLTK data download failed, the bundled stopword lists will be used")
+        sys.exit(1)
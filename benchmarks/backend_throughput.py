@@ -0,0 +1,88 @@
+# Run from the project root: python -m benchmarks.backend_throughput
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from src.service import AsyncDBService, DBService, LLMService
+from benchmarks.fakes import FakeOllamaHandler
+from benchmarks.handler_latency import percentile
+from benchmarks.streaming_latency import use_fake_ollama
+from benchmarks.text_cleaning import make_transcript
+
+N_USERS = 8
+REQUESTS_PER_USER = 4
+INTERACTIVE_SLOTS = 4       # slots of the "fast" backend, so a summary job visibly competes for them
+TRANSCRIPT_WORDS = 60_000   # over MAX_TOKENS_ALLOWED after cleaning, summarized by map-reduce
+
+
+async def load(model: str) -> float:
+    async def user(user_id: int):
+        for i in range(REQUESTS_PER_USER):
+            await LLMService.complete_response(f"question {i}", "", "en", "?", user_id=user_id, model=model)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(user_id) for user_id in range(N_USERS)))
+    elapsed = time.perf_counter() - start
+    await LLMService.close_llm_clients()
+    return elapsed
+
+
+async def questions_during_summary(transcript: str, token_length: int):
+    """Interactive users on the fast backend ask while user 0 summarizes a long transcript."""
+    async def summary():
+        start = time.perf_counter()
+        async for _ in LLMService.stream_summary(transcript, "en", "sum", token_length=token_length, user_id=0,
+                                                 model="fake"):
+            pass
+        return time.perf_counter() - start
+
+    async def question(user_id: int):
+        start = time.perf_counter()
+        await LLMService.complete_response("quick question", "", "en", "?", user_id=user_id, model="fake")
+        return time.perf_counter() - start
+
+    job = asyncio.create_task(summary())
+    await asyncio.sleep(0.05)
+    latencies = await asyncio.gather(*(question(user_id) for user_id in range(1, N_USERS + 1)))
+    job_seconds = await job
+    await LLMService.close_llm_clients()
+    return latencies, job_seconds
+
+
+def measure():
+    LLMService.logger.disabled = True
+    LLMService.LLM_BACKENDS["fake"].piece_delay = 0.01
+    FakeOllamaHandler.n_tokens, FakeOllamaHandler.token_delay, FakeOllamaHandler.first_token_delay = 20, 0.01, 0.3
+
+    print(f"{N_USERS} users x {REQUESTS_PER_USER} requests per backend")
+    for model in ("fake", "local"):
+        LLMService.reset_backend_stats()
+        elapsed = asyncio.run(load(model))
+        stats = LLMService.get_backend_stats()[model]
+        print(f"{model:<6} {LLMService.BACKEND_CONCURRENCY[model]} slots: {stats['requests'] / elapsed:6.1f} req/s  "
+              f"{stats['chars'] / elapsed:8.0f} chars/s  {stats['seconds'] / stats['requests'] * 1000:5.0f} ms per request  "
+              f"{stats['failures']} failures")
+
+    LLMService.BACKEND_CONCURRENCY["fake"] = INTERACTIVE_SLOTS
+    LLMService._backend_slots.clear()
+    transcript, _, token_length = LLMService.clean_and_trim_text(make_transcript(TRANSCRIPT_WORDS))
+    print(f"\n{N_USERS} quick questions on 'fake' ({INTERACTIVE_SLOTS} slots) during a {token_length}-token summary:")
+    for summary_model in ("fake", "local"):
+        LLMService.get_config = lambda: {"SUMMARY_MODEL": summary_model}
+        LLMService._chunk_summaries.clear()
+        LLMService.reset_backend_stats()
+        latencies, job_seconds = asyncio.run(questions_during_summary(transcript, token_length))
+        chunks = LLMService.get_backend_stats().get(summary_model, {}).get("requests", 0)
+        print(f"map step on {summary_model:<6} question p50={percentile(latencies, 50) * 1000:5.0f} ms  "
+              f"max={max(latencies) * 1000:5.0f} ms  summary done after {job_seconds * 1000:5.0f} ms "
+              f"({chunks} calls on {summary_model})")
+
+
+if __name__ == "__main__":
+    use_fake_ollama()
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "backends.db"
+        DBService.init_db()
+        measure()
+        AsyncDBService.shutdown()
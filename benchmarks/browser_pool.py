@@ -0,0 +1,65 @@
+# Run from the project root: python -m benchmarks.browser_pool [n_urls]
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from playwright.async_api import async_playwright
+
+from src.service.FIleService import fetch_page_with_playwright, browser_pool
+
+PAGE = b"<html><head><title>Article</title></head><body>" + b"<p>Some article text.</p>" * 200 + b"</body></html>"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+async def legacy_fetch(url: str) -> str:
+    # Previous behaviour: start Playwright and launch Chromium for every URL
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.goto(url, timeout=15000)
+        content = await page.content()
+        await browser.close()
+        return content
+
+
+async def timed(fetch, urls, concurrent: bool) -> float:
+    start = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(fetch(url) for url in urls))
+    else:
+        for url in urls:
+            await fetch(url)
+    return (time.perf_counter() - start) / len(urls) * 1000
+
+
+async def measure(n_urls: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/article/{i}" for i in range(n_urls)]
+
+    await browser_pool.start()
+    for concurrent in (False, True):
+        mode = "concurrent" if concurrent else "sequential"
+        legacy_ms = await timed(legacy_fetch, urls, concurrent)
+        pooled_ms = await timed(fetch_page_with_playwright, urls, concurrent)
+        print(f"{mode:<10} launch per URL {legacy_ms:7.0f} ms/url   pooled {pooled_ms:6.0f} ms/url "
+              f"(pool of {browser_pool.max_pages} pages)")
+    await browser_pool.stop()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(measure(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,92 @@
+# Run from the project root: python -m benchmarks.db_throughput
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from src.service import DBService
+
+
+def legacy_store_message(user_id: int, text: str, is_from_user: str = 'Y'):
+    # Connection-per-call behaviour DBService had before the connection manager
+    with sqlite3.connect(DBService.DB_PATH) as conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO user_messages (user_id, message, is_from_user) VALUES (?, ?, ?)",
+            (user_id, text, is_from_user)
+        )
+        conn.commit()
+
+
+def legacy_get_last_messages(user_id: int, limit=10):
+    with sqlite3.connect(DBService.DB_PATH) as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT message, is_from_user FROM user_messages WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (user_id, limit)
+        )
+        return list(reversed(c.fetchall()))
+
+
+def run_turns(store, read, n_turns: int, n_users: int = 20) -> float:
+    """Simulate chat turns (user message, history read, bot reply) and return stored messages per second."""
+    start = time.perf_counter()
+    for i in range(n_turns):
+        user_id = i % n_users
+        store(user_id, f"message {i}")
+        read(user_id, 10)
+        store(user_id, f"reply {i}", 'N')
+    return (2 * n_turns) / (time.perf_counter() - start)
+
+
+def measure_write_burst(n_messages: int = 20000, n_users: int = 200):
+    """Many users chatting at once: stored messages per second and number of commits."""
+    flushes = []
+    flush_messages = DBService.flush_messages
+
+    def counting_flush():
+        written = flush_messages()
+        if written:
+            flushes.append(written)
+        return written
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "burst.db"
+        DBService.init_db()
+        DBService.flush_messages = counting_flush
+        try:
+            start = time.perf_counter()
+            for i in range(n_messages):
+                DBService.store_message(i % n_users, f"message {i}", 'Y' if i % 2 else 'N')
+            DBService.close_connections()
+            elapsed = time.perf_counter() - start
+        finally:
+            DBService.flush_messages = flush_messages
+
+    print(f"{'write-behind burst':<20} {n_messages / elapsed:>10.0f} messages/sec, "
+          f"{len(flushes)} commits for {n_messages} messages")
+
+
+def measure_throughput(n_turns: int = 2000):
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "legacy.db"
+        DBService.init_db()
+        DBService.close_connections()
+        with sqlite3.connect(DBService.DB_PATH) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")  # back to the default rollback journal
+        timings["connect per call"] = run_turns(legacy_store_message, legacy_get_last_messages, n_turns)
+
+        DBService.DB_PATH = Path(tmp) / "pooled.db"
+        DBService.init_db()
+        timings["pooled + WAL"] = run_turns(DBService.store_message, DBService.get_last_messages, n_turns)
+        DBService.close_connections()
+
+    for name, rate in timings.items():
+        print(f"{name:<20} {rate:>10.0f} messages/sec")
+    return timings
+
+
+if __name__ == "__main__":
+    measure_throughput()
+    measure_write_burst()
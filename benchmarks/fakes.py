@@ -0,0 +1,131 @@
+# Offline stand-ins for the external services the bot talks to
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+
+class StubTranscript:
+    def __init__(self, video_id: str, language_code: str, n_lines: int, delay: float):
+        self.video_id = video_id
+        self.language_code = language_code
+        self.n_lines = n_lines
+        self.delay = delay
+
+    def fetch(self):
+        time.sleep(self.delay)
+        return [SimpleNamespace(text=f"{self.video_id} line {i}") for i in range(self.n_lines)]
+
+
+class StubTranscriptList:
+    def __init__(self, video_id: str, languages, n_lines: int, delay: float):
+        self._generated_transcripts = {
+            code: StubTranscript(video_id, code, n_lines, delay) for code in languages
+        }
+        self._manually_created_transcripts = {}
+
+    def find_transcript(self, language_codes):
+        for code in language_codes:
+            if code in self._generated_transcripts:
+                return self._generated_transcripts[code]
+        raise LookupError(f"No transcript for {language_codes}")
+
+
+class StubTranscriptApi:
+    """Drop-in for YouTubeTranscriptApi: same list()/find_transcript()/fetch() surface, no network."""
+    calls = 0
+    delay = 0.2  # simulated YouTube round-trip per request
+    n_lines = 2000
+    languages = ("en", "ru")
+
+    def list(self, video_id: str):
+        StubTranscriptApi.calls += 1
+        time.sleep(self.delay)
+        return StubTranscriptList(video_id, self.languages, self.n_lines, self.delay)
+
+
+def stub_video_title(video_id: str) -> str:
+    return f"Stub video {video_id}"
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for Ollama's /api/generate: produces `n_tokens` words, one every `token_delay`
+    seconds, streamed as NDJSON when the request asks for it and as a single JSON body otherwise.
+    """
+    n_tokens = 60
+    token_delay = 0.05
+    first_token_delay = 0.3  # prompt processing before the first token
+    prompt_chars_per_second = None  # when set, longer prompts also take longer to process
+    # What the server saw: requests, the largest prompt and the most requests served at once
+    requests = 0
+    max_prompt_chars = 0
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.requests += 1
+            cls.max_prompt_chars = max(cls.max_prompt_chars, len(payload.get("prompt", "")))
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            self._generate(payload)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    @classmethod
+    def reset_stats(cls):
+        with cls.lock:
+            cls.requests = cls.max_prompt_chars = cls.max_in_flight = 0
+
+    def _generate(self, payload: dict):
+        words = [f"word{i} " for i in range(self.n_tokens)]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if payload.get("stream") else "application/json")
+        self.end_headers()
+        delay = self.first_token_delay
+        if self.prompt_chars_per_second:
+            delay += len(payload.get("prompt", "")) / self.prompt_chars_per_second
+        time.sleep(delay)
+
+        if not payload.get("stream"):
+            time.sleep(self.token_delay * self.n_tokens)
+            self.wfile.write(json.dumps({"response": "".join(words), "done": True}).encode())
+            return
+        try:
+            for word in words:
+                self.wfile.write(json.dumps({"response": word, "done": False}).encode() + b"\n")
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading, as Ollama sees when a request is cancelled
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_ollama() -> str:
+    """Serve FakeOllamaHandler on a free local port, returns its generate URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/api/generate"
+
+
+class FakeMessage:
+    """Telegram message stand-in that records when each edit became visible."""
+    def __init__(self):
+        self.edits = []
+        self.replies = []
+
+    async def edit_text(self, text: str, parse_mode=None):
+        self.edits.append((time.perf_counter(), text))
+
+    async def reply_text(self, text: str, parse_mode=None):
+        self.replies.append((time.perf_counter(), text))
@@ -0,0 +1,81 @@
+# Run from the project root: python -m benchmarks.handler_latency [n_users]
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.service import DBService, AsyncDBService
+
+LLM_DELAY = 0.05  # simulated model round-trip, awaited without blocking
+TRANSCRIPT_SIZE = 256 * 1024  # saved context per user, read on every turn like /qc does
+
+
+async def blocking_handler(user_id: int):
+    # What the handlers did before: DB calls run directly on the event loop
+    DBService.store_message(user_id, "hello")
+    DBService.get_last_messages(user_id, 50)
+    DBService.get_user_context(user_id)
+    await asyncio.sleep(LLM_DELAY)
+    DBService.store_message(user_id, "reply", 'N')
+    DBService.save_user_context(user_id, language="en")
+
+
+async def async_handler(user_id: int):
+    await AsyncDBService.store_message(user_id, "hello")
+    await AsyncDBService.get_last_messages(user_id, 50)
+    await AsyncDBService.get_user_context(user_id)
+    await asyncio.sleep(LLM_DELAY)
+    await AsyncDBService.store_message(user_id, "reply", 'N')
+    await AsyncDBService.save_user_context(user_id, language="en")
+
+
+async def probe_loop_lag(stop: asyncio.Event, interval: float = 0.005):
+    """Measure how late a 5 ms timer fires, i.e. how long other chats would be frozen."""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return lags
+
+
+async def simulate_users(handler, n_users: int):
+    # All users send their message at the same moment, so latency is measured from a shared arrival time
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    await asyncio.sleep(0)
+    arrival = time.perf_counter()
+
+    async def timed(user_id):
+        await handler(user_id)
+        return time.perf_counter() - arrival
+
+    latencies = await asyncio.gather(*(timed(user_id) for user_id in range(n_users)))
+    stop.set()
+    return latencies, await probe
+
+
+def percentile(values, pct: float) -> float:
+    return statistics.quantiles(values, n=100)[int(pct) - 1]
+
+
+def measure_latency(n_users: int = 200):
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "load.db"
+        DBService.init_db()
+        for user_id in range(n_users):
+            DBService.save_user_context(user_id, transcript="x" * TRANSCRIPT_SIZE, title="video", language="en")
+
+        for name, handler in (("blocking", blocking_handler), ("async", async_handler)):
+            latencies, lags = asyncio.run(simulate_users(handler, n_users))
+            print(f"{name:<10} users={n_users} p50={percentile(latencies, 50) * 1000:.1f} ms "
+                  f"p99={percentile(latencies, 99) * 1000:.1f} ms "
+                  f"max loop stall={max(lags) * 1000:.1f} ms")
+
+        AsyncDBService.shutdown()
+
+
+if __name__ == "__main__":
+    measure_latency(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,51 @@
+# Run from the project root: python -m benchmarks.html_extraction
+import time
+from pathlib import Path
+
+import tiktoken
+from bs4 import BeautifulSoup
+
+from src.service.HtmlService import HTML_BACKENDS, extract_text_from_html
+
+FIXTURES = Path(__file__).parent / "fixtures"
+ROUNDS = 50
+
+
+def legacy_extract(html: str) -> str:
+    # Previous extract_text_from_html: html.parser, only script/style removed
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(['script', 'style']):
+        tag.decompose()
+    return soup.get_text(separator=' ', strip=True)
+
+
+def timed(func, html: str):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        text = func(html)
+    return text, (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def token_counter():
+    try:
+        enc = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(enc.encode(text)), "tokens"
+    except Exception:
+        # Encoding files can't be downloaded (offline), whitespace words are a rough stand-in
+        return lambda text: len(text.split()), "words"
+
+
+def measure(fixture: str = "news_article.html"):
+    html = (FIXTURES / fixture).read_text(encoding="utf-8")
+    count, unit = token_counter()
+    print(f"{fixture}: {len(html) / 1024:.0f} KB of HTML")
+
+    runs = [("legacy bs4", legacy_extract)]
+    runs += [(name, lambda h, name=name: extract_text_from_html(h, backend=name)) for name in HTML_BACKENDS]
+    for name, func in runs:
+        text, ms = timed(func, html)
+        print(f"{name:<12} {ms:7.2f} ms  {count(text):6} {unit}  starts: {text[:60]!r}")
+
+
+if __name__ == "__main__":
+    measure()
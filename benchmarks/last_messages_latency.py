@@ -0,0 +1,73 @@
+# Run from the project root: python -m benchmarks.last_messages_latency [rows ...]
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.service import DBService
+
+N_USERS = 1000
+N_QUERIES = 50
+
+LEGACY_QUERY = """
+    SELECT message, is_from_user
+    FROM user_messages
+    WHERE user_id = ?
+    ORDER BY timestamp DESC LIMIT ?
+"""
+
+
+def create_legacy_db(path: Path, n_rows: int):
+    """Unversioned schema without primary key or index, filled with n_rows messages."""
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE user_messages (
+                user_id INTEGER,
+                message TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                is_from_user
+            )
+        """)
+        rows = (
+            (i % N_USERS, f"message {i}", f"2025-01-01 00:00:{i % 60:02d}", 'Y' if i % 2 else 'N')
+            for i in range(n_rows)
+        )
+        conn.executemany(
+            "INSERT INTO user_messages (user_id, message, timestamp, is_from_user) VALUES (?, ?, ?, ?)", rows
+        )
+
+
+def time_queries(query_func) -> float:
+    """Average latency in milliseconds of fetching the last 50 messages of random users."""
+    user_ids = [random.randrange(N_USERS) for _ in range(N_QUERIES)]
+    start = time.perf_counter()
+    for user_id in user_ids:
+        query_func(user_id)
+    return (time.perf_counter() - start) / N_QUERIES * 1000
+
+
+def measure_latency(sizes=(10_000, 1_000_000, 10_000_000)):
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            DBService.DB_PATH = Path(tmp) / "history.db"
+            create_legacy_db(DBService.DB_PATH, n_rows)
+
+            with sqlite3.connect(DBService.DB_PATH) as conn:
+                legacy_ms = time_queries(lambda user_id: conn.execute(LEGACY_QUERY, (user_id, 50)).fetchall())
+
+            start = time.perf_counter()
+            DBService.init_db()
+            migration_s = time.perf_counter() - start
+
+            indexed_ms = time_queries(lambda user_id: DBService.get_last_messages(user_id, 50))
+            DBService.close_connections()
+
+        print(f"rows={n_rows:>10,}  legacy={legacy_ms:9.3f} ms  indexed={indexed_ms:7.3f} ms  "
+              f"(migration took {migration_s:.1f} s)")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]]
+    measure_latency(sizes) if sizes else measure_latency()
@@ -0,0 +1,80 @@
+# Run from the project root: python -m benchmarks.llm_gateway_load [n_users]
+import asyncio
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from src.service import AsyncDBService, DBService, LLMService
+from benchmarks.fakes import FakeOllamaHandler
+from benchmarks.handler_latency import simulate_users, percentile
+from benchmarks.streaming_latency import use_fake_ollama
+
+LOCAL_CONCURRENCY = 4  # slots given to the fake model, it serves any number in parallel
+
+
+async def blocking_handler(user_id: int):
+    # What generate_response did before: a synchronous requests.post on the event loop
+    LLMService.get_local_response(f"question {user_id}", "", "en", "?")
+
+
+async def gateway_handler(user_id: int):
+    await LLMService.generate_response(f"question {user_id}", "", "", "en", use_cache=False, user_id=user_id)
+
+
+class FifoSlots:
+    """Plain first-come first-served semaphore with the FairSemaphore.slot interface, for comparison."""
+
+    def __init__(self, value: int):
+        self._semaphore = asyncio.Semaphore(value)
+
+    @asynccontextmanager
+    async def slot(self, user_id=None, timeout: float = None):
+        async with self._semaphore:
+            yield
+
+
+async def burst_then_single(burst: int):
+    """User 1 queues a long map-reduce worth of requests, user 2 asks one question right after."""
+    start = time.perf_counter()
+    heavy = asyncio.gather(*(LLMService.complete_response("", f"chunk {i}", "en", "chunk", user_id=1) for i in range(burst)))
+    await asyncio.sleep(0.01)
+    await LLMService.complete_response("quick question", "", "en", "?", user_id=2)
+    single = time.perf_counter() - start
+    await heavy
+    return single, time.perf_counter() - start
+
+
+def measure(n_users: int = 16):
+    FakeOllamaHandler.n_tokens, FakeOllamaHandler.token_delay, FakeOllamaHandler.first_token_delay = 20, 0.01, 0.3
+    LLMService.logger.disabled = True
+    LLMService.BACKEND_CONCURRENCY["local"] = LOCAL_CONCURRENCY
+    per_call = FakeOllamaHandler.first_token_delay + FakeOllamaHandler.n_tokens * FakeOllamaHandler.token_delay
+    print(f"fake model: ~{per_call * 1000:.0f} ms per answer, {n_users} users asking at once, "
+          f"{LOCAL_CONCURRENCY} backend slots")
+
+    for name, handler in (("blocking", blocking_handler), ("gateway", gateway_handler)):
+        FakeOllamaHandler.reset_stats()
+        LLMService._backend_slots.clear()
+        latencies, lags = asyncio.run(simulate_users(handler, n_users))
+        asyncio.run(LLMService.close_llm_clients())
+        print(f"{name:<9} p50={percentile(latencies, 50) * 1000:6.0f} ms  max={max(latencies) * 1000:6.0f} ms  "
+              f"served at once={FakeOllamaHandler.max_in_flight}  max loop stall={max(lags) * 1000:6.0f} ms")
+
+    burst = 4 * LOCAL_CONCURRENCY
+    for name, slots in (("fifo", FifoSlots(LOCAL_CONCURRENCY)), ("fair", LLMService.FairSemaphore(LOCAL_CONCURRENCY))):
+        LLMService._backend_slots["local"] = slots
+        single, total = asyncio.run(burst_then_single(burst))
+        asyncio.run(LLMService.close_llm_clients())
+        print(f"{name} queue: user 2's question behind user 1's {burst} requests answered after {single * 1000:.0f} ms "
+              f"(all done after {total * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    use_fake_ollama()
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "gateway.db"
+        DBService.init_db()
+        measure(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
+        AsyncDBService.shutdown()
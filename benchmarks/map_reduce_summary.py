@@ -0,0 +1,41 @@
+# Run from the project root: python -m benchmarks.map_reduce_summary
+import asyncio
+import time
+
+from src.service import LLMService
+from benchmarks.fakes import FakeOllamaHandler
+from benchmarks.streaming_latency import use_fake_ollama
+from benchmarks.text_cleaning import make_transcript
+
+
+async def summarize(text: str, q_type: str, token_length: int):
+    FakeOllamaHandler.reset_stats()
+    start = time.perf_counter()
+    answer = "".join([piece async for piece in LLMService.stream_summary(text, "en", q_type, 300, token_length)])
+    elapsed = time.perf_counter() - start
+    print(f"/{'sm' if q_type == 'sum' else 'ssm':<4} {elapsed * 1000:6.0f} ms  {FakeOllamaHandler.requests:3} model calls  "
+          f"at most {FakeOllamaHandler.max_in_flight} at once  largest prompt {FakeOllamaHandler.max_prompt_chars} chars")
+    return answer
+
+
+async def measure(words: int = 100_000):
+    FakeOllamaHandler.n_tokens, FakeOllamaHandler.token_delay, FakeOllamaHandler.first_token_delay = 20, 0.01, 0.3
+    LLMService.logger.disabled = True
+    text, trimmed, token_length = LLMService.clean_and_trim_text(make_transcript(words))
+    chunks = LLMService.split_into_token_chunks(text)
+    print(f"{words}-word transcript: {token_length} tokens after cleaning, budget {LLMService.MAX_TOKENS_ALLOWED}, "
+          f"{len(chunks)} chunks; as a single prompt it would be {len(text)} chars")
+
+    await summarize(text, "sum", token_length)
+    await summarize(text, "sup_sum", token_length)  # chunk summaries come from the cache
+
+    LLMService._chunk_summaries.clear()
+    LLMService.SUMMARY_CONCURRENCY = 1
+    print("sequential map step for comparison:")
+    await summarize(text, "sum", token_length)
+    await LLMService.close_llm_clients()
+
+
+if __name__ == "__main__":
+    use_fake_ollama()
+    asyncio.run(measure())
@@ -0,0 +1,87 @@
+# Run from the project root: python -m benchmarks.pdf_extraction [synthetic_pages]
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from src.service import FIleService
+from benchmarks.handler_latency import probe_loop_lag
+
+RULES_PDF = Path("src") / "resources" / "Mage_Wars_Rules_Supplement.pdf"
+
+
+def legacy_extract(pdf_path: str) -> str:
+    # Previous behaviour: one process, string concatenation, run on the event loop
+    text = ""
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text += page.get_text()
+    return text
+
+
+def create_synthetic_pdf(path: Path, n_pages: int):
+    line = "The quick brown fox jumps over the lazy dog while the mage casts a spell. " * 2
+    with fitz.open() as doc:
+        for index in range(n_pages):
+            page = doc.new_page()
+            page.insert_textbox(page.rect + (36, 36, -36, -36), f"Page {index}\n" + (line + "\n") * 40, fontsize=9)
+        doc.save(path)
+
+
+async def run_legacy(pdf_path: str):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    text = legacy_extract(pdf_path)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return text, elapsed, max(await probe, default=elapsed)
+
+
+async def run_parallel(pdf_path: str):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    start = time.perf_counter()
+    first_page = None
+    pages = []
+    async for text in FIleService.aiter_pdf_pages(pdf_path):
+        if first_page is None:
+            first_page = time.perf_counter() - start
+        pages.append(text)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return "".join(pages), elapsed, first_page, max(await probe)
+
+
+async def measure(pdf_path: str, label: str):
+    # Warm all worker processes up: their start-up is paid once per bot run, not per document
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(FIleService.get_pdf_executor(), FIleService._count_pdf_pages, pdf_path)
+        for _ in range(FIleService.PDF_WORKERS)
+    ))
+
+    legacy_text, legacy_s, legacy_stall = await run_legacy(pdf_path)
+    text, parallel_s, first_page_s, stall = await run_parallel(pdf_path)
+    assert text == legacy_text, "parallel extraction must produce the same text"
+
+    print(f"{label:<28} legacy {legacy_s * 1000:8.0f} ms (loop blocked {legacy_stall * 1000:6.0f} ms)   "
+          f"parallel {parallel_s * 1000:7.0f} ms, first page after {first_page_s * 1000:5.0f} ms "
+          f"(loop blocked {stall * 1000:4.1f} ms)")
+
+
+async def main(synthetic_pages: int):
+    await measure(str(RULES_PDF), RULES_PDF.name)
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic = Path(tmp) / "synthetic.pdf"
+        create_synthetic_pdf(synthetic, synthetic_pages)
+        await measure(str(synthetic), f"synthetic {synthetic_pages} pages")
+    FIleService.shutdown_pdf_workers()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
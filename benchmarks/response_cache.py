@@ -0,0 +1,48 @@
+# Run from the project root: python -m benchmarks.response_cache
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from src.service import AsyncDBService, DBService, LLMService
+from benchmarks.fakes import FakeOllamaHandler
+from benchmarks.streaming_latency import use_fake_ollama
+from benchmarks.text_cleaning import make_transcript
+
+
+async def summarize(label: str, text: str, token_length: int, use_cache: bool = True):
+    # What generate_summary does for /sm
+    FakeOllamaHandler.reset_stats()
+    start = time.perf_counter()
+    key = LLMService.response_cache_key("sum", "en", text)
+    pieces = LLMService.cached_stream(key, LLMService.stream_summary(text, "en", "sum", token_length=token_length), use_cache)
+    answer = "".join([piece async for piece in pieces])
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:<28} {elapsed:8.1f} ms  {FakeOllamaHandler.requests:3} model calls")
+    return answer
+
+
+async def measure(words: int = 100_000):
+    FakeOllamaHandler.n_tokens, FakeOllamaHandler.token_delay, FakeOllamaHandler.first_token_delay = 20, 0.01, 0.3
+    LLMService.logger.disabled = True
+    text, _, token_length = LLMService.clean_and_trim_text(make_transcript(words))
+    print(f"{words}-word transcript, {token_length} tokens")
+
+    first = await summarize("/sm, cold", text, token_length)
+    again = await summarize("/sm again", text, token_length)
+    assert again == first
+    # Another user, same video: the transcript text is identical apart from whitespace
+    await summarize("/sm by another user", "  " + text.replace(" ", "  ") + "\n", token_length)
+    await summarize("/nocache then /sm", text, token_length, use_cache=False)
+    await summarize("short text, cold", "a short transcript about cats", 6)
+    await summarize("short text again", "a short transcript about cats", 6)
+    await LLMService.close_llm_clients()
+
+
+if __name__ == "__main__":
+    use_fake_ollama()
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "responses.db"
+        DBService.init_db()
+        asyncio.run(measure())
+        AsyncDBService.shutdown()
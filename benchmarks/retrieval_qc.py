@@ -0,0 +1,57 @@
+# Run from the project root: python -m benchmarks.retrieval_qc
+import asyncio
+import time
+
+from src.service import LLMService, RetrievalService
+from benchmarks.fakes import FakeOllamaHandler
+from benchmarks.streaming_latency import use_fake_ollama
+from benchmarks.text_cleaning import make_transcript
+
+# Facts hidden in the filler, each with a question that should retrieve it
+FACTS = [
+    ("The Kalan expedition set up its base camp at Lake Baikal in March.", "Where was the Kalan base camp?"),
+    ("Professor Ivanova measured the glacier retreat at forty meters per year.", "How fast is the glacier retreating?"),
+    ("The prototype battery lasted nine hours on a single charge.", "How long did the prototype battery last?"),
+]
+PROMPT_CHARS_PER_SECOND = 50_000  # prompt processing speed of the fake model
+
+
+def make_context(words: int) -> str:
+    parts = [make_transcript(words // (len(FACTS) + 1), seed=i) for i in range(len(FACTS) + 1)]
+    text = parts[0]
+    for (fact, _), part in zip(FACTS, parts[1:]):
+        text += f" {fact} {part}"
+    return text
+
+
+async def ask(question: str, context: str) -> float:
+    start = time.perf_counter()
+    async for _ in LLMService.stream_response(question, context, "en", "?c"):
+        pass
+    return (time.perf_counter() - start) * 1000
+
+
+async def measure(words: int = 100_000):
+    FakeOllamaHandler.n_tokens, FakeOllamaHandler.token_delay = 20, 0.01
+    FakeOllamaHandler.first_token_delay, FakeOllamaHandler.prompt_chars_per_second = 0.2, PROMPT_CHARS_PER_SECOND
+    context = make_context(words)
+
+    start = time.perf_counter()
+    RetrievalService.build_index(1, context)
+    print(f"{words}-word context, {len(context)} chars: index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    await ask("warm-up", "")
+    for fact, question in FACTS:
+        start = time.perf_counter()
+        selected = RetrievalService.select_context(1, question, context)
+        select_ms = (time.perf_counter() - start) * 1000
+        full_ms = await ask(question, context)
+        top_k_ms = await ask(question, selected)
+        print(f"{question!r}: found={fact in selected}, selection {select_ms:.1f} ms, "
+              f"prompt {len(context)} -> {len(selected)} chars, answer {full_ms:.0f} -> {top_k_ms:.0f} ms")
+    await LLMService.close_llm_clients()
+
+
+if __name__ == "__main__":
+    use_fake_ollama()
+    asyncio.run(measure())
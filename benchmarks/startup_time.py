@@ -0,0 +1,30 @@
+# Run from the project root: python -m benchmarks.startup_time
+import statistics
+import subprocess
+import sys
+import time
+
+ROUNDS = 5
+# What importing LLMService used to do before anything else could happen
+LEGACY_DOWNLOADS = "import nltk; nltk.download('punkt', quiet=True); nltk.download('stopwords', quiet=True)"
+
+
+def cold_start(code: str) -> float:
+    """Wall time of a fresh interpreter running `code`, in ms."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(code: str, label: str):
+    cold_start(code)  # let the OS cache the files
+    times = [cold_start(code) for _ in range(ROUNDS)]
+    print(f"{label:<32} median {statistics.median(times):7.0f} ms  max {max(times):7.0f} ms")
+
+
+if __name__ == "__main__":
+    measure("pass", "bare interpreter")
+    measure("import nltk", "import nltk")
+    measure(LEGACY_DOWNLOADS, "import-time nltk.download (old)")
+    measure("import src.service.LLMService", "import LLMService")
+    measure("import HomeBot", "import HomeBot")
@@ -0,0 +1,43 @@
+# Run from the project root: python -m benchmarks.streaming_latency
+import asyncio
+import time
+
+from src.service import LLMService
+from benchmarks.fakes import FakeOllamaHandler, FakeMessage, start_fake_ollama
+import HomeBot
+
+
+def use_fake_ollama():
+    config = {"LOCAL_LLM_URL": start_fake_ollama(), "LLM_MODEL": "fake"}
+    LLMService.get_credential = config.__getitem__
+    LLMService.get_config = lambda: config
+    LLMService.DEFAULT_MODEL = "local"  # users without a stored model
+
+
+def measure_blocking() -> float:
+    """Previous path: nothing is visible until the whole answer is back."""
+    start = time.perf_counter()
+    LLMService.get_local_response("question", "", "en", "?")
+    return (time.perf_counter() - start) * 1000
+
+
+async def measure_streaming():
+    async for _ in LLMService.stream_response("warm-up", "", "en", "?"):
+        break  # the HTTP client is created once per bot run, not per answer
+    message = FakeMessage()
+    start = time.perf_counter()
+    await HomeBot.stream_reply(message, LLMService.stream_response("question", "", "en", "?"), LLMService.escape_markdown)
+    await LLMService.close_llm_clients()
+    first_visible = (message.edits[0][0] - start) * 1000
+    done = (message.edits[-1][0] - start) * 1000
+    return first_visible, done, len(message.edits)
+
+
+if __name__ == "__main__":
+    use_fake_ollama()
+    total = FakeOllamaHandler.first_token_delay + FakeOllamaHandler.n_tokens * FakeOllamaHandler.token_delay
+    print(f"fake model: {FakeOllamaHandler.n_tokens} tokens, ~{total:.1f} s per answer")
+    measure_blocking()
+    print(f"blocking:  first visible text after {measure_blocking():.0f} ms")
+    first_visible, done, edits = asyncio.run(measure_streaming())
+    print(f"streaming: first visible text after {first_visible:.0f} ms, complete after {done:.0f} ms, {edits} message edits")
@@ -0,0 +1,95 @@
+# Run from the project root: python -m benchmarks.text_cleaning
+import asyncio
+import random
+import time
+
+import tiktoken
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize, RegexpTokenizer
+
+from src.service import LLMService
+from benchmarks.handler_latency import probe_loop_lag
+
+ROUNDS = 20
+VOCABULARY = (
+    "the a of and to in is that it for on with as was this be are at by "
+    "transcript video speaker audience question answer example model data system time people world "
+    "really basically actually okay so um uh you know like right"
+).split()
+
+
+def make_transcript(words: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) + ("." if rng.random() < 0.05 else "") for _ in range(words))
+
+
+def legacy_clean_and_trim_text(text: str, lang: str = "en", max_tokens: int = LLMService.MAX_TOKENS_ALLOWED,
+                               model: str = LLMService.DEFAULT_MODEL):
+    # clean_and_trim_text before the resource cache and the single pass: encoder, stopwords and
+    # tokenizer resolved on every call, two full encodes, split/join and Punkt word_tokenize
+    try:
+        enc = tiktoken.encoding_for_model(model)
+    except KeyError:
+        enc = tiktoken.get_encoding("cl100k_base")
+    dirty_tokens = enc.encode(text)
+    text = ' '.join(text.split())
+    token_lang = LLMService.get_nltk_language_code(lang)
+    try:
+        words = word_tokenize(text, language=token_lang)
+    except LookupError:
+        words = RegexpTokenizer(r'\w+').tokenize(text)
+    try:
+        stop_words = set(stopwords.words(token_lang))
+    except LookupError:
+        stop_words = set()
+    filtered_words = [w for w in words if w.lower() not in stop_words and w.isalnum()]
+    cleaned_text = ' '.join(filtered_words)
+    tokens = enc.encode(cleaned_text)
+    return cleaned_text, len(tokens) > max_tokens, len(tokens)
+
+
+def timed(func, text: str, rounds: int = ROUNDS):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(text)
+    return result, (time.perf_counter() - start) / rounds * 1000
+
+
+async def clean_while_probing(text: str):
+    """Cleaning a long transcript must not freeze the event loop for other chats."""
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    start = time.perf_counter()
+    result = await LLMService.clean_and_trim_text_async(text)
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    return result, elapsed, max(await probe) * 1000
+
+
+def measure(words: int = 100_000):
+    LLMService.logger.disabled = True  # per-call info logging is not what is measured
+    LLMService.warm_up_resources()
+    short_text = make_transcript(20)
+    transcript = make_transcript(words)
+
+    # A short text isolates the per-call resource lookup from the actual cleaning work
+    _, legacy_short = timed(legacy_clean_and_trim_text, short_text, rounds=200)
+    _, short_ms = timed(LLMService.clean_and_trim_text, short_text, rounds=200)
+    print(f"per-call overhead (20 words): legacy {legacy_short:.3f} ms, now {short_ms:.3f} ms")
+
+    legacy_result, legacy_ms = timed(legacy_clean_and_trim_text, transcript)
+    result, single_ms = timed(LLMService.clean_and_trim_text, transcript)
+    _, debug_ms = timed(lambda text: LLMService.clean_and_trim_text(text, count_before=True), transcript)
+    # Windowed counting must match encoding the whole cleaned text at once
+    assert result[2] == len(LLMService.get_encoder(LLMService.DEFAULT_MODEL).encode_ordinary(result[0]))
+    print(f"{words} words: legacy {legacy_ms:.1f} ms ({legacy_result[2]} tokens), "
+          f"single pass {single_ms:.1f} ms ({result[2]} tokens), with 'before' count {debug_ms:.1f} ms")
+
+    asyncio.run(clean_while_probing(transcript))  # start the worker process
+    _, async_ms, stall = asyncio.run(clean_while_probing(transcript))
+    print(f"worker process: {async_ms:.1f} ms, event loop blocked at most {stall:.1f} ms")
+    LLMService.shutdown_text_workers()
+
+
+if __name__ == "__main__":
+    measure()
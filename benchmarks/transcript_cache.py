@@ -0,0 +1,70 @@
+# Run from the project root: python -m benchmarks.transcript_cache
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from src.service import DBService, YTService
+from benchmarks.fakes import StubTranscriptApi, stub_video_title
+from benchmarks.handler_latency import probe_loop_lag
+
+
+def timed_fetch(video_id: str, lang: str = "en"):
+    start = time.perf_counter()
+    result = asyncio.run(YTService.fetch_transcript(video_id, lang))
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def fetch_while_probing(video_id: str):
+    """A cache miss against a slow API must not freeze the event loop for other chats."""
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    await YTService.fetch_transcript(video_id, "en")
+    stop.set()
+    return max(await probe)
+
+
+def measure_cache():
+    YTService.YouTubeTranscriptApi = StubTranscriptApi
+    YTService.get_video_title = stub_video_title
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "cache.db"
+        DBService.init_db()
+
+        _, miss_ms = timed_fetch("aaaaaaaaaaa")
+        result, hit_ms = timed_fetch("aaaaaaaaaaa")
+        assert StubTranscriptApi.calls == 1, "second fetch should be served from the cache"
+        print(f"miss {miss_ms:8.1f} ms, hit {hit_ms:6.2f} ms, {len(result['text'])} chars")
+
+        # A user with another preferred language gets the same entry
+        timed_fetch("aaaaaaaaaaa", "ru")
+        assert StubTranscriptApi.calls == 1, "the preferred language must not split the cache"
+
+        # Room for roughly two compressed transcripts: the least recently used one goes first
+        timed_fetch("ccccccccccc")
+        DBService.TRANSCRIPT_CACHE_MAX_BYTES = 2 * DBService.get_connection().execute(
+            "SELECT MAX(size) FROM transcript_cache").fetchone()[0]
+        timed_fetch("aaaaaaaaaaa")  # touch, so the 'ccccccccccc' entry becomes the oldest
+        timed_fetch("bbbbbbbbbbb")
+        cached = DBService.get_connection().execute(
+            "SELECT video_id, language_code FROM transcript_cache ORDER BY video_id").fetchall()
+        assert cached == [("aaaaaaaaaaa", "en"), ("bbbbbbbbbbb", "en")], cached
+        print(f"after eviction: {cached}")
+
+        # Expired entries are fetched again
+        DBService.TRANSCRIPT_CACHE_TTL = 0
+        calls = StubTranscriptApi.calls
+        time.sleep(0.01)
+        timed_fetch("bbbbbbbbbbb")
+        assert StubTranscriptApi.calls == calls + 1
+        print("expired entry refetched")
+
+        stall = asyncio.run(fetch_while_probing("ccccccccccc"))
+        print(f"max event loop stall during a {StubTranscriptApi.delay * 2 * 1000:.0f} ms miss: {stall * 1000:.1f} ms")
+
+        DBService.close_connections()
+
+
+if __name__ == "__main__":
+    measure_cache()
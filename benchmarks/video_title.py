@@ -0,0 +1,82 @@
+# Run from the project root: python -m benchmarks.video_title
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.service import DBService, YTService
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGE_SIZE = 1_500_000  # typical size of a full watch page
+
+
+def check_parsers():
+    oembed = (FIXTURES / "oembed.json").read_text(encoding="utf-8")
+    assert YTService.parse_oembed_title(oembed) == "100 Men vs 1 Gorilla — Who Wins? | Deep Dive"
+
+    head = (FIXTURES / "watch_page_head.html").read_text(encoding="utf-8")
+    assert YTService.parse_watch_page_title(head) == "Как приготовить борщ & пампушки"
+    assert YTService.parse_watch_page_title(head[:head.index("</title>")]) is None
+    assert YTService.parse_oembed_title("Not Found") == ""
+    print("parsers match the fixtures")
+
+
+class WatchPageHandler(BaseHTTPRequestHandler):
+    """
+    Serves the fixture page head padded to PAGE_SIZE, paced like a remote server,
+    and counts the bytes sent before the client hung up.
+    """
+    sent = 0
+    done = threading.Event()
+
+    def do_GET(self):
+        if self.path.startswith("/oembed"):
+            self.send_response(404)  # force the watch-page fallback
+            self.end_headers()
+            return
+        body = (FIXTURES / "watch_page_head.html").read_bytes()
+        body += b"<script>" + b"x" * (PAGE_SIZE - len(body)) + b"</script>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 8192):
+                self.wfile.write(body[i:i + 8192])
+                self.wfile.flush()
+                WatchPageHandler.sent += len(body[i:i + 8192])
+                time.sleep(0.002)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client stopped reading after the title, which is the point
+        finally:
+            WatchPageHandler.done.set()
+
+    def log_message(self, *args):
+        pass
+
+
+def measure_bytes_read():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WatchPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    YTService.OEMBED_URL = base + "/oembed?v={video_id}"
+    YTService.WATCH_URL = base + "/watch?v={video_id}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DBService.DB_PATH = Path(tmp) / "meta.db"
+        DBService.init_db()
+
+        title = YTService.get_video_title("aaaaaaaaaaa")
+        WatchPageHandler.done.wait(5)
+        first_read = WatchPageHandler.sent
+        assert YTService.get_video_title("aaaaaaaaaaa") == title
+        assert WatchPageHandler.sent == first_read, "second lookup should come from the cache"
+        DBService.close_connections()
+
+    server.shutdown()
+    print(f"title '{title}': {first_read / 1024:.0f} KB sent of a {PAGE_SIZE / 1024:.0f} KB page, cached afterwards")
+
+
+if __name__ == "__main__":
+    check_parsers()
+    measure_bytes_read()
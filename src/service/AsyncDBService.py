@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from src.service import DBService
+
+# SQLite allows one writer at a time, so the writes made here go through a single thread.
+# Reads run on a small pool: in WAL mode they never wait for the writer. Two writes happen
+# elsewhere and rely on busy_timeout instead: get_last_messages flushes buffered messages on
+# its reader thread, and YTService stores video titles from asyncio.to_thread workers.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_readers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db-reader")
+
+
+async def _run(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+async def store_message(user_id: int, text: str, is_from_user: str = 'Y'):
+    # Only appends to the write-behind buffer, so there is nothing to offload
+    return DBService.store_message(user_id, text, is_from_user)
+
+
+async def get_last_messages(user_id: int, limit=10, is_from_user: str = None):
+    return await _run(_readers, DBService.get_last_messages, user_id, limit, is_from_user)
+
+
+async def save_user_context(user_id: int, transcript=None, title=None, language=None, continue_context=None, model=None):
+    return await _run(_writer, DBService.save_user_context, user_id, transcript, title, language, continue_context,
+                      model)
+
+
+async def get_user_context(user_id: int):
+    # Cache hits are answered on the event loop, only misses go to a reader thread
+    cached = DBService.get_cached_user_context(user_id)
+    if cached is not None:
+        return cached
+    return await _run(_readers, DBService.get_user_context, user_id)
+
+
+async def save_context_chunk(user_id: int, content: str, source: str = None, append: bool = False):
+    return await _run(_writer, DBService.save_context_chunk, user_id, content, source, append)
+
+
+async def get_context_sources(user_id: int):
+    return await _run(_readers, DBService.get_context_sources, user_id)
+
+
+async def get_context_chunk(user_id: int, seq: int):
+    return await _run(_readers, DBService.get_context_chunk, user_id, seq)
+
+
+async def get_cached_transcript(video_id: str):
+    # Refreshes the entry's access time, so it is a write
+    return await _run(_writer, DBService.get_cached_transcript, video_id)
+
+
+async def put_cached_transcript(video_id: str, language_code: str, result: dict):
+    return await _run(_writer, DBService.put_cached_transcript, video_id, language_code, result)
+
+
+
+async def get_cached_response(key: str):
+    # Refreshes the entry's access time, so it is a write
+    return await _run(_writer, DBService.get_cached_response, key)
+
+
+async def put_cached_response(key: str, response: str):
+    return await _run(_writer, DBService.put_cached_response, key, response)
+
+
+def shutdown():
+    """Wait for queued writes, stop the worker threads and close their connections."""
+    _writer.shutdown(wait=True)
+    _readers.shutdown(wait=True)
+    DBService.close_connections()
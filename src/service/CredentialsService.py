@@ -1,34 +1,74 @@
 import json
+import logging
+import signal
 import sys
 from pathlib import Path
 
-def get_credential(key: str = "TOKEN"):
+logger = logging.getLogger("HomeBotLogger")
+
+_config = None
+
+
+def find_config_path() -> Path:
     """
-    Retrieve a specific credential from config.json.
+    Locate config.json.
     Always resolves path from project root — works both when run from root and from unit test/main inside src/.
     """
     # Try to resolve project root assuming src/service/LLMService.py is 2 levels down
+    main_file = getattr(sys.modules['__main__'], '__file__', None)       # unset in worker processes and the REPL
     candidate_paths = [
-        Path(sys.modules['__main__'].__file__).resolve().parent,            # main script location (works from HomeBot)
+        Path(main_file).resolve().parent if main_file else None,            # main script location (works from HomeBot)
         Path(__file__).resolve().parents[2],                                # fallback if directly running LLMService
         Path.cwd(),                                                         # as a last resort, current working dir
     ]
 
-    for base in candidate_paths:
+    for base in filter(None, candidate_paths):
         config_path = base / "src" / "resources" / "config.json"
         if config_path.exists():
-            break
-    else:
-        raise FileNotFoundError("Could not locate config.json in expected paths.")
+            return config_path
+    raise FileNotFoundError("Could not locate config.json in expected paths.")
 
+
+def reload_config() -> dict:
+    """Read config.json again. The previous configuration stays in use if the file can't be read."""
+    global _config
+    config_path = find_config_path()
     try:
         with config_path.open() as f:
             config = json.load(f)
     except json.JSONDecodeError as e:
         raise ValueError(f"Failed to parse JSON in {config_path}: {e}")
 
-    value = config.get(key)
+    _config = config
+    return config
+
+
+def get_config() -> dict:
+    """The parsed config.json, read on first use only."""
+    return _config if _config is not None else reload_config()
+
+
+def get_credential(key: str = "TOKEN"):
+    """
+    Retrieve a specific credential from config.json.
+    """
+    value = get_config().get(key)
     if not value:
         raise KeyError(f"Missing '{key}' in config file.")
 
     return value
+
+
+def install_reload_signal():
+    """Reload config.json on SIGHUP (where the platform has it), e.g. after rotating a key."""
+    if not hasattr(signal, "SIGHUP"):
+        return
+
+    def _on_sighup(signum, frame):
+        try:
+            reload_config()
+            logger.info("Configuration reloaded")
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"Configuration reload failed, keeping the previous one: {e}")
+
+    signal.signal(signal.SIGHUP, _on_sighup)
@@ -1,109 +1,653 @@
+import atexit
+import json
+import logging
 import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timezone
 from pathlib import Path
 
+logger = logging.getLogger("HomeBotLogger")
+
 DB_PATH = Path("data") / "user_messages.db"
 DB_PATH.parent.mkdir(exist_ok=True)
 
+# Applied once to every connection right after it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+STATEMENT_CACHE_SIZE = 128
+
+# Write-behind buffer for store_message: flushed as one transaction when it reaches
+# MESSAGE_BATCH_SIZE rows, MESSAGE_FLUSH_INTERVAL seconds after the first buffered row,
+# before any message read and at interpreter exit
+MESSAGE_BATCH_SIZE = 64
+MESSAGE_FLUSH_INTERVAL = 1.0
+
+# In-process LRU of get_user_context results, bounded by the size of the cached strings
+CONTEXT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Fetched YouTube transcripts, shared by all users: zlib-compressed, expired after the TTL and
+# trimmed least-recently-used first once the compressed total exceeds the size limit
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 3600
+TRANSCRIPT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+TRANSCRIPT_CACHE_KEY = ("video_id", "language_code")
+
+# Model answers, keyed by a hash of everything that shapes them (LLMService.response_cache_key),
+# with the same TTL and least-recently-used trimming as the transcript cache
+RESPONSE_CACHE_TTL = 3 * 24 * 3600
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_KEY = ("key",)
+
+# Statements are module constants so sqlite3 keeps reusing their prepared versions from the connection cache
+INSERT_MESSAGE_SQL = "INSERT INTO user_messages (user_id, message, is_from_user, timestamp) VALUES (?, ?, ?, ?)"
+SELECT_LAST_MESSAGES_SQL = """
+    SELECT message, is_from_user
+    FROM user_messages
+    WHERE user_id = ?
+    ORDER BY timestamp DESC, id DESC LIMIT ?
+"""
+SELECT_LAST_MESSAGES_BY_SENDER_SQL = """
+    SELECT message, is_from_user
+    FROM user_messages
+    WHERE user_id = ? AND is_from_user = ?
+    ORDER BY timestamp DESC, id DESC LIMIT ?
+"""
+SELECT_CONTEXT_SQL = "SELECT title, language, continue_context, model FROM user_context WHERE user_id=?"
+SELECT_CHUNKS_SQL = "SELECT source, content FROM context_chunks WHERE user_id = ? ORDER BY seq"
+SELECT_CHUNK_SOURCES_SQL = "SELECT seq, source, length(content) FROM context_chunks WHERE user_id = ? ORDER BY seq"
+SELECT_CHUNK_SQL = "SELECT content FROM context_chunks WHERE user_id = ? AND seq = ?"
+DELETE_CHUNKS_SQL = "DELETE FROM context_chunks WHERE user_id = ?"
+INSERT_CHUNK_SQL = """
+    INSERT INTO context_chunks (user_id, seq, source, content)
+    SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ? FROM context_chunks WHERE user_id = ?
+"""
+ENSURE_CONTEXT_SQL = "INSERT OR IGNORE INTO user_context (user_id) VALUES (?)"
+# Any language of a video will do: which transcript fetch_transcript picks doesn't depend on the user
+SELECT_TRANSCRIPT_SQL = """
+    SELECT language_code, payload, created_at FROM transcript_cache
+    WHERE video_id = ?
+    ORDER BY accessed_at DESC
+    LIMIT 1
+"""
+SELECT_RESPONSE_SQL = "SELECT response, created_at FROM response_cache WHERE key = ?"
+UPSERT_RESPONSE_SQL = """
+    INSERT INTO response_cache (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        response=excluded.response,
+        size=excluded.size,
+        created_at=excluded.created_at,
+        accessed_at=excluded.accessed_at
+"""
+SELECT_VIDEO_TITLE_SQL = "SELECT title FROM video_metadata WHERE video_id = ?"
+UPSERT_VIDEO_TITLE_SQL = """
+    INSERT INTO video_metadata (video_id, title, fetched_at) VALUES (?, ?, ?)
+    ON CONFLICT(video_id) DO UPDATE SET title=excluded.title, fetched_at=excluded.fetched_at
+"""
+UPSERT_TRANSCRIPT_SQL = """
+    INSERT INTO transcript_cache (video_id, language_code, payload, size, created_at, accessed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(video_id, language_code) DO UPDATE SET
+        payload=excluded.payload,
+        size=excluded.size,
+        created_at=excluded.created_at,
+        accessed_at=excluded.accessed_at
+"""
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+_pending_messages = []
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flush_wakeup = threading.Event()
+_flusher = None
+
+_context_cache = OrderedDict()  # user_id -> (context dict, size in bytes)
+_context_cache_bytes = 0
+_context_cache_writes = 0  # bumped on every context write, see get_user_context
+_context_cache_lock = threading.Lock()
+_context_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return the long-lived connection of the calling thread, opening it on first use.
+    The connection is reopened after close_connections() or when DB_PATH changes.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH and _local.generation == _generation:
+        return conn
+
+    conn = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+    with _connections_lock:
+        _connections.append(conn)
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.generation = _generation
+    return conn
+
+
+def close_connections():
+    """Flush buffered messages, then close every connection handed out by get_connection (call on shutdown)."""
+    global _generation
+    flush_messages()
+    invalidate_user_context()
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+
+
+def _create_base_tables(conn: sqlite3.Connection):
+    # Original schema, plus the columns older databases got through manual ALTER TABLEs
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_messages (
+            user_id INTEGER,
+            message TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            is_from_user char DEFAULT 'Y'
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_context (
+            user_id INTEGER PRIMARY KEY,
+            transcript TEXT,
+            title TEXT,
+            language TEXT,
+            continue_context BOOLEAN DEFAULT 0
+        )
+    """)
+    if "is_from_user" not in _table_columns(conn, "user_messages"):
+        conn.execute("ALTER TABLE user_messages ADD COLUMN is_from_user char DEFAULT 'Y'")
+    if "continue_context" not in _table_columns(conn, "user_context"):
+        conn.execute("ALTER TABLE user_context ADD COLUMN continue_context BOOLEAN DEFAULT 0")
+
+
+def _rebuild_user_messages(conn: sqlite3.Connection):
+    # Rowid primary key keeps insertion order, the index serves get_last_messages without a scan or sort
+    conn.execute("""
+        CREATE TABLE user_messages_new (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            message TEXT,
+            timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            is_from_user CHAR(1) NOT NULL DEFAULT 'Y'
+        )
+    """)
+    conn.execute("""
+        INSERT INTO user_messages_new (user_id, message, timestamp, is_from_user)
+        SELECT user_id, message, COALESCE(timestamp, CURRENT_TIMESTAMP), COALESCE(is_from_user, 'Y')
+        FROM user_messages
+        WHERE user_id IS NOT NULL
+        ORDER BY timestamp, rowid
+    """)
+    conn.execute("DROP TABLE user_messages")
+    conn.execute("ALTER TABLE user_messages_new RENAME TO user_messages")
+    conn.execute("CREATE INDEX idx_user_messages_user_ts ON user_messages (user_id, timestamp)")
+
+
+def _create_context_chunks(conn: sqlite3.Connection):
+    # Transcripts become an ordered list of source chunks, so appending a document only writes that document
+    conn.execute("""
+        CREATE TABLE context_chunks (
+            user_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            source TEXT,
+            content TEXT NOT NULL,
+            PRIMARY KEY (user_id, seq)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO context_chunks (user_id, seq, source, content)
+        SELECT user_id, 0, title, transcript FROM user_context WHERE transcript IS NOT NULL
+    """)
+    conn.execute("UPDATE user_context SET transcript = NULL")
+
+
+def _create_transcript_cache(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE transcript_cache (
+            video_id TEXT NOT NULL,
+            language_code TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (video_id, language_code)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_transcript_cache_accessed ON transcript_cache (accessed_at)")
+
+
+def _create_video_metadata(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE video_metadata (
+            video_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    """)
+
+
+def _create_response_cache(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE response_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_response_cache_accessed ON response_cache (accessed_at)")
+
+
+def _add_user_model(conn: sqlite3.Connection):
+    # LLM backend chosen with /select_model, NULL means the default one
+    conn.execute("ALTER TABLE user_context ADD COLUMN model TEXT")
+
+
+# Ordered (version, migration) pairs; the applied version is kept in PRAGMA user_version.
+# Append new steps at the end, never edit or reorder applied ones.
+MIGRATIONS = (
+    (1, _create_base_tables),
+    (2, _rebuild_user_messages),
+    (3, _create_context_chunks),
+    (4, _create_transcript_cache),
+    (5, _create_video_metadata),
+    (6, _create_response_cache),
+    (7, _add_user_model),
+)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def get_schema_version() -> int:
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate() -> int:
+    """Apply pending migrations, each in its own transaction. Returns the resulting schema version."""
+    conn = get_connection()
+    version = get_schema_version()
+
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        # sqlite3 does not open transactions for DDL on its own, so BEGIN explicitly
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+
+    return version
+
+
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS user_messages (
-                user_id INTEGER,
-                message TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                is_from_user
-            )
-        """)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS user_context (
-                user_id INTEGER PRIMARY KEY,
-                transcript TEXT,
-                title TEXT,
-                language TEXT,
-                continue_context BOOLEAN DEFAULT 0
-            )
-        """)
-        conn.commit()
-
-#with sqlite3.connect(DB_PATH) as conn:
-#    c = conn.cursor()
-#    c.execute("ALTER TABLE user_context ADD COLUMN continue_context BOOLEAN DEFAULT 0")
-#    conn.commit()
-
-# with sqlite3.connect(DB_PATH) as conn:
-#    c = conn.cursor()
-#    c.execute("ALTER TABLE user_messages ADD COLUMN is_from_user char DEFAULT 'Y'")
-#    conn.commit()
+    migrate()
+
+def _flusher_loop():
+    while True:
+        _flush_wakeup.wait()
+        _flush_wakeup.clear()
+        # Give the batch a chance to fill up unless it is already full
+        if len(_pending_messages) < MESSAGE_BATCH_SIZE:
+            _flush_wakeup.wait(MESSAGE_FLUSH_INTERVAL)
+            _flush_wakeup.clear()
+        try:
+            flush_messages()
+        except Exception as e:
+            # The rows are back in the buffer; retry after a pause instead of losing the thread
+            logger.error(f"Flushing buffered messages failed, retrying: {e}")
+            time.sleep(MESSAGE_FLUSH_INTERVAL)
+            _flush_wakeup.set()
+
+
+def _start_flusher():
+    global _flusher
+    with _pending_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flusher_loop, name="db-flusher", daemon=True)
+            _flusher.start()
+
+
+def flush_messages() -> int:
+    """Write all buffered messages in a single transaction. Returns the number of rows written."""
+    global _pending_messages
+    with _flush_lock:
+        with _pending_lock:
+            batch, _pending_messages = _pending_messages, []
+        if not batch:
+            return 0
+
+        try:
+            conn = get_connection()
+            with conn:
+                conn.executemany(INSERT_MESSAGE_SQL, batch)
+        except Exception:
+            # Put the rows back in front so nothing is lost and order is kept
+            with _pending_lock:
+                _pending_messages = batch + _pending_messages
+            raise
+        return len(batch)
+
+
+atexit.register(flush_messages)
+
 
 def store_message(user_id: int, text: str, is_from_user: str = 'Y'):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO user_messages (user_id, message, is_from_user) VALUES (?, ?, ?)",
-            (user_id, text, is_from_user)
-        )
-        conn.commit()
+    # Timestamp is taken now, not at flush time, so history order matches arrival order
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    with _pending_lock:
+        _pending_messages.append((user_id, text, is_from_user, timestamp))
+        pending = len(_pending_messages)
+
+    if _flusher is None:
+        _start_flusher()
+    if pending == 1 or pending >= MESSAGE_BATCH_SIZE:
+        _flush_wakeup.set()
 
 
 def get_last_messages(user_id: int, limit=10, is_from_user: str = None):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
+    flush_messages()  # read-your-writes: buffered messages must be visible to history lookups
+    conn = get_connection()
+
+    if is_from_user in ('Y', 'N'):
+        rows = conn.execute(SELECT_LAST_MESSAGES_BY_SENDER_SQL, (user_id, is_from_user, limit)).fetchall()
+    else:
+        rows = conn.execute(SELECT_LAST_MESSAGES_SQL, (user_id, limit)).fetchall()
+
+    return list(reversed(rows))  # List of (message, is_from_user) tuples
+
+
+@lru_cache(maxsize=None)
+def _upsert_context_sql(columns: tuple) -> str:
+    # One statement per column subset (at most 31), so the prepared-statement cache covers them all
+    return f"""
+        INSERT INTO user_context (user_id, {", ".join(columns)})
+        VALUES (?{", ?" * len(columns)})
+        ON CONFLICT(user_id) DO UPDATE SET
+            {", ".join(f"{column}=excluded.{column}" for column in columns)}
+    """
+
+
+def save_user_context(user_id: int, transcript=None, title=None, language=None, continue_context=None, model=None):
+    """
+    Upsert only the fields that are not None, in a single statement without reading the row first.
+    Fields left as None keep their stored value (or the column default for a new row).
+    A transcript replaces all context chunks of the user with a single one.
+    """
+    changes = {
+        column: value
+        for column, value in (
+            ("title", title),
+            ("language", language),
+            ("continue_context", continue_context),
+            ("model", model),
+        )
+        if value is not None
+    }
+    if not changes and transcript is None:
+        return
+
+    conn = get_connection()
+    with conn:
+        if changes:
+            conn.execute(_upsert_context_sql(tuple(changes)), (user_id, *changes.values()))
+        if transcript is not None:
+            _insert_context_chunk(conn, user_id, transcript, title, append=False)
+
+    if transcript is not None:
+        invalidate_user_context(user_id)
+        return
+    if "continue_context" in changes:
+        changes["continue_context"] = bool(changes["continue_context"])
+    _update_cached_context(user_id, changes)
+
+
+def _insert_context_chunk(conn: sqlite3.Connection, user_id: int, content: str, source: str, append: bool):
+    conn.execute(ENSURE_CONTEXT_SQL, (user_id,))
+    if not append:
+        conn.execute(DELETE_CHUNKS_SQL, (user_id,))
+    conn.execute(INSERT_CHUNK_SQL, (user_id, source, content, user_id))
+
+
+def save_context_chunk(user_id: int, content: str, source: str = None, append: bool = False):
+    """
+    Store a piece of context (a transcript, page or document) for the user.
+    With append the chunk is added after the existing ones, otherwise it replaces them.
+    Either way only the new chunk is written.
+    """
+    conn = get_connection()
+    with conn:
+        _insert_context_chunk(conn, user_id, content, source, append)
+    invalidate_user_context(user_id)
+
+
+def iter_context_chunks(user_id: int):
+    """Lazily yield (source, content) for each context chunk of the user, in order."""
+    cursor = get_connection().execute(SELECT_CHUNKS_SQL, (user_id,))
+    for source, content in cursor:
+        yield source, content
+
+
+def get_context_sources(user_id: int):
+    """List (seq, source, length) of the user's context chunks without loading their content."""
+    return get_connection().execute(SELECT_CHUNK_SOURCES_SQL, (user_id,)).fetchall()
+
+
+def get_context_chunk(user_id: int, seq: int):
+    row = get_connection().execute(SELECT_CHUNK_SQL, (user_id, seq)).fetchone()
+    return row[0] if row else None
+
+
+def get_cached_video_title(video_id: str):
+    row = get_connection().execute(SELECT_VIDEO_TITLE_SQL, (video_id,)).fetchone()
+    return row[0] if row else None
+
+
+def put_cached_video_title(video_id: str, title: str):
+    conn = get_connection()
+    with conn:
+        conn.execute(UPSERT_VIDEO_TITLE_SQL, (video_id, title, time.time()))
+
+
+@lru_cache(maxsize=None)
+def _cache_sql(table: str, key_columns: tuple) -> tuple:
+    # touch, delete and LRU scan statements of a TTL + LRU cache table keyed by key_columns
+    where = " AND ".join(f"{column} = ?" for column in key_columns)
+    return (
+        f"UPDATE {table} SET accessed_at = ? WHERE {where}",
+        f"DELETE FROM {table} WHERE {where}",
+        f"SELECT {', '.join(key_columns)}, size FROM {table} ORDER BY accessed_at",
+    )
 
-        query = """
-            SELECT message, is_from_user
-            FROM user_messages
-            WHERE user_id = ?
-        """
-        params = [user_id]
 
-        if is_from_user in ('Y', 'N'):
-            query += " AND is_from_user = ?"
-            params.append(is_from_user)
+def _touch_cache_entry(conn: sqlite3.Connection, table: str, key_columns: tuple, key: tuple,
+                       created_at: float, ttl: float) -> bool:
+    """Delete an entry that was just read if it is older than ttl, else mark it used. True if it is fresh."""
+    touch_sql, delete_sql, _ = _cache_sql(table, key_columns)
+    now = time.time()
+    with conn:
+        if now - created_at > ttl:
+            conn.execute(delete_sql, key)
+            return False
+        conn.execute(touch_sql, (now, *key))
+    return True
 
-        query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
 
-        c.execute(query, tuple(params))
-        rows = c.fetchall()
-        return list(reversed(rows))  # List of (message, is_from_user) tuples
+def _evict_cache_entries(conn: sqlite3.Connection, table: str, key_columns: tuple, now: float,
+                         ttl: float, max_bytes: int):
+    """Drop expired entries, then least recently used ones until the table holds at most max_bytes."""
+    _, delete_sql, lru_sql = _cache_sql(table, key_columns)
+    conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (now - ttl,))
 
+    total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+    if total <= max_bytes:
+        return
 
-def save_user_context(user_id: int, transcript=None, title=None, language=None, continue_context=None):
-    current = get_user_context(user_id)
+    evicted = []
+    for *key, size in conn.execute(lru_sql):
+        if total <= max_bytes:
+            break
+        evicted.append(key)
+        total -= size
+    conn.executemany(delete_sql, evicted)
 
-    transcript = transcript if transcript is not None else (current["transcript"] if current else None)
-    title = title if title is not None else (current["title"] if current else None)
-    language = language if language is not None else (current["language"] if current else None)
-    continue_context = continue_context if continue_context is not None else (current["continue_context"] if current else 0)
 
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("""
-            INSERT INTO user_context (user_id, transcript, title, language, continue_context)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                transcript=excluded.transcript,
-                title=excluded.title,
-                language=excluded.language,
-                continue_context=excluded.continue_context
-        """, (user_id, transcript, title, language, continue_context))
-        conn.commit()
+def get_cached_transcript(video_id: str):
+    """Return a cached fetch_transcript result, or None if it is missing or older than TRANSCRIPT_CACHE_TTL."""
+    conn = get_connection()
+    row = conn.execute(SELECT_TRANSCRIPT_SQL, (video_id,)).fetchone()
+    if not row:
+        return None
+
+    language_code, payload, created_at = row
+    if not _touch_cache_entry(conn, "transcript_cache", TRANSCRIPT_CACHE_KEY, (video_id, language_code),
+                              created_at, TRANSCRIPT_CACHE_TTL):
+        return None
+    return json.loads(zlib.decompress(payload))
+
+
+def put_cached_transcript(video_id: str, language_code: str, result: dict):
+    payload = zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute(UPSERT_TRANSCRIPT_SQL, (video_id, language_code, payload, len(payload), now, now))
+        _evict_cache_entries(conn, "transcript_cache", TRANSCRIPT_CACHE_KEY, now,
+                             TRANSCRIPT_CACHE_TTL, TRANSCRIPT_CACHE_MAX_BYTES)
+
+
+def get_cached_response(key: str):
+    """Return a cached model answer, or None if it is missing or older than RESPONSE_CACHE_TTL."""
+    conn = get_connection()
+    row = conn.execute(SELECT_RESPONSE_SQL, (key,)).fetchone()
+    if not row:
+        return None
+
+    response, created_at = row
+    if not _touch_cache_entry(conn, "response_cache", RESPONSE_CACHE_KEY, (key,), created_at, RESPONSE_CACHE_TTL):
+        return None
+    return response
+
+
+def put_cached_response(key: str, response: str):
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute(UPSERT_RESPONSE_SQL, (key, response, len(response.encode("utf-8")), now, now))
+        _evict_cache_entries(conn, "response_cache", RESPONSE_CACHE_KEY, now,
+                             RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_BYTES)
+
+
+def _context_size(context: dict) -> int:
+    return sum(sys.getsizeof(value) for value in context.values() if isinstance(value, str))
 
 
+def _cache_context(user_id: int, context: dict):
+    global _context_cache_bytes
+    size = _context_size(context)
+    if size > CONTEXT_CACHE_MAX_BYTES:
+        return
+
+    old = _context_cache.pop(user_id, None)
+    if old:
+        _context_cache_bytes -= old[1]
+    _context_cache[user_id] = (context, size)
+    _context_cache_bytes += size
+
+    while _context_cache_bytes > CONTEXT_CACHE_MAX_BYTES:
+        _, (_, evicted_size) = _context_cache.popitem(last=False)
+        _context_cache_bytes -= evicted_size
+        _context_cache_stats["evictions"] += 1
+
+
+def _update_cached_context(user_id: int, changes: dict):
+    """Write-through: apply a committed change to the cached entry, if there is one."""
+    global _context_cache_writes
+    with _context_cache_lock:
+        _context_cache_writes += 1
+        entry = _context_cache.get(user_id)
+        if entry:
+            _cache_context(user_id, {**entry[0], **changes})
+
+
+def invalidate_user_context(user_id: int = None):
+    """Drop one user's cached context, or the whole cache when user_id is None."""
+    global _context_cache_bytes, _context_cache_writes
+    with _context_cache_lock:
+        _context_cache_writes += 1
+        if user_id is None:
+            _context_cache.clear()
+            _context_cache_bytes = 0
+        else:
+            entry = _context_cache.pop(user_id, None)
+            if entry:
+                _context_cache_bytes -= entry[1]
+
+
+def get_context_cache_stats() -> dict:
+    with _context_cache_lock:
+        return {**_context_cache_stats, "entries": len(_context_cache), "bytes": _context_cache_bytes}
+
+
+def get_cached_user_context(user_id: int):
+    """Return the cached context of a user without touching the database, or None on a miss."""
+    with _context_cache_lock:
+        entry = _context_cache.get(user_id)
+        if entry is None:
+            return None
+        _context_cache.move_to_end(user_id)
+        _context_cache_stats["hits"] += 1
+        return dict(entry[0])
+
 
 def get_user_context(user_id: int):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT transcript, title, language, continue_context FROM user_context WHERE user_id=?", (user_id,))
-        row = c.fetchone()
-    if row:
-        return {
-            "transcript": row[0],
-            "title": row[1],
-            "language": row[2],
-            "continue_context": bool(row[3]),
-        }
-    else:
+    cached = get_cached_user_context(user_id)
+    if cached is not None:
+        return cached
+
+    with _context_cache_lock:
+        _context_cache_stats["misses"] += 1
+        writes_before = _context_cache_writes
+
+    row = get_connection().execute(SELECT_CONTEXT_SQL, (user_id,)).fetchone()
+    if not row:
         return None
 
+    contents = [content for _, content in iter_context_chunks(user_id)]
+    context = {
+        "transcript": "\n".join(contents) if contents else None,
+        "title": row[0],
+        "language": row[1],
+        "continue_context": bool(row[2]),
+        "model": row[3],
+    }
+    with _context_cache_lock:
+        # A write that landed while we were reading may not be in this row, so don't cache it
+        if _context_cache_writes == writes_before:
+            _cache_context(user_id, context)
+    return dict(context)
@@ -1,10 +1,47 @@
 import re
+import os
+import asyncio
+import multiprocessing
+import logging
+import time
+import httpx
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 import fitz  # PyMuPDF
 from frontend import *
-from playwright.async_api import async_playwright
-from typing import Union
+from playwright.async_api import async_playwright, Error as PlaywrightError
+from typing import Union, BinaryIO
+from src.service.HtmlService import extract_text_from_html
+
+logger = logging.getLogger("HomeBotLogger")
+
+BROWSER_MAX_PAGES = 4          # pages rendered at the same time
+BROWSER_RECYCLE_AFTER = 200    # relaunch Chromium after this many pages to cap its memory growth
+PAGE_TIMEOUT = 15000
+
+# Plain HTTP is tried first; pages whose text looks incomplete are rendered in the browser
+HTTP_TIMEOUT = 10
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+}
+STATIC_MIN_TEXT_CHARS = 500
+JS_REQUIRED_PATTERN = re.compile(r"(enable|requires?|turn on) javascript|javascript (is )?(disabled|required)", re.I)
+SPA_ROOT_PATTERN = re.compile(r'<div id="(?:root|app|__next|__nuxt)"[^>]*>\s*</div>', re.I)
+DOMAIN_STRATEGY_SIZE = 1024
+DOMAIN_STRATEGY_TTL = 6 * 3600  # a remembered strategy is re-checked after this many seconds
+
+# PDF text is extracted in page ranges by worker processes and capped in pages and UTF-8 bytes
+PDF_MAX_PAGES = 2000
+PDF_MAX_TEXT_BYTES = 20 * 1024 * 1024
+PDF_PAGES_PER_TASK = 25
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+_pdf_executor = None
+_http_client = None
+_domain_strategy = OrderedDict()  # netloc -> ("http" | "browser", expiry time), most recently used last
 
 def is_valid_url(input_str: str) -> bool:
     """Check if input is a valid URL and not a YouTube link."""
@@ -16,42 +53,288 @@ def is_valid_url(input_str: str) -> bool:
     except Exception:
         return False
 
+class BrowserPool:
+    """
+    One headless Chromium shared by all URL fetches.
+    Every fetch gets its own isolated context, at most max_pages at a time.
+    The browser is relaunched after recycle_after pages or when it crashed.
+    """
+
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES, recycle_after: int = BROWSER_RECYCLE_AFTER):
+        self.max_pages = max_pages
+        self.recycle_after = recycle_after
+        self._playwright = None
+        self._browser = None
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._active = 0
+        self._served = 0
+
+    async def start(self):
+        async with self._lock:
+            await self._ensure_browser()
+
+    async def stop(self):
+        async with self._lock:
+            await self._close_browser()
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def is_connected(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _ensure_browser(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+        # Recycling waits until no page is in use, a crashed browser is replaced right away
+        recycle = self._served >= self.recycle_after and self._active == 0
+        if self.is_connected() and not recycle:
+            return self._browser
+
+        await self._close_browser()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._served = 0
+        logger.info("Headless browser launched")
+        return self._browser
+
+    async def _close_browser(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass  # already gone
+            self._browser = None
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            async with self._lock:
+                browser = await self._ensure_browser()
+                self._active += 1
+                self._served += 1
+            try:
+                context = await browser.new_context()
+                try:
+                    yield await context.new_page()
+                finally:
+                    await context.close()
+            finally:
+                self._active -= 1
+
+
+browser_pool = BrowserPool()
+
+
 async def fetch_page_with_playwright(url: str) -> str:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto(url, timeout=15000)
-        content = await page.content()
-        await browser.close()
-        return content
-
-def extract_text_from_html(html: str) -> str:
-    """Extract visible text from raw HTML."""
-    soup = BeautifulSoup(html, 'html.parser')
-    for tag in soup(['script', 'style']):
-        tag.decompose()
-    return soup.get_text(separator=' ', strip=True)
-
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from a PDF file."""
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
-
-async def extract_text(input_data: Union[str, bytes]) -> str:
+    for attempt in range(2):
+        try:
+            async with browser_pool.page() as page:
+                await page.goto(url, timeout=PAGE_TIMEOUT)
+                return await page.content()
+        except PlaywrightError:
+            # Retry once if the browser died under us, navigation errors are the caller's problem
+            if attempt or browser_pool.is_connected():
+                raise
+            logger.warning("Headless browser crashed, relaunching")
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def fetch_page_with_http(url: str):
+    """Fetch raw HTML without rendering. Returns None for errors and non-HTML responses."""
+    try:
+        resp = await get_http_client().get(url)
+    except httpx.HTTPError as e:
+        logger.debug(f"Plain HTTP fetch failed for {url}: {e}")
+        return None
+    if resp.status_code >= 400 or "html" not in resp.headers.get("content-type", ""):
+        return None
+    return resp.text
+
+
+def needs_javascript(html: str, text: str) -> bool:
+    """Does the page say it is rendered client-side: a JavaScript notice or an empty SPA mount point?"""
+    if JS_REQUIRED_PATTERN.search(text[:2000]):
+        return True
+    # An empty SPA mount point with little text around it means the content is rendered client-side
+    return bool(SPA_ROOT_PATTERN.search(html)) and len(text) < 4 * STATIC_MIN_TEXT_CHARS
+
+
+def looks_complete(html: str, text: str) -> bool:
+    """Heuristic: does the page text fetched without JavaScript already contain the content?"""
+    return len(text) >= STATIC_MIN_TEXT_CHARS and not needs_javascript(html, text)
+
+
+def _remember_strategy(domain: str, strategy: str):
+    _domain_strategy[domain] = (strategy, time.monotonic() + DOMAIN_STRATEGY_TTL)
+    _domain_strategy.move_to_end(domain)
+    if len(_domain_strategy) > DOMAIN_STRATEGY_SIZE:
+        _domain_strategy.popitem(last=False)
+
+
+def _remembered_strategy(domain: str):
+    entry = _domain_strategy.get(domain)
+    if entry is None:
+        return None
+    strategy, expires_at = entry
+    if time.monotonic() > expires_at:
+        del _domain_strategy[domain]
+        return None
+    return strategy
+
+
+async def fetch_page_text(url: str) -> str:
+    """
+    Text of a web page: a plain HTTP GET first, the headless browser only when that text looks incomplete.
+    Domains whose pages are rendered client-side skip the HTTP attempt for DOMAIN_STRATEGY_TTL.
+    """
+    domain = urlparse(url).netloc.lower()
+
+    if _remembered_strategy(domain) != "browser":
+        html = await fetch_page_with_http(url)
+        if html:
+            text = await asyncio.to_thread(extract_text_from_html, html)
+            if looks_complete(html, text):
+                _remember_strategy(domain, "http")
+                return text
+            # A failed fetch or one short page says nothing about the rest of the domain
+            if needs_javascript(html, text):
+                _remember_strategy(domain, "browser")
+        logger.debug(f"Plain HTTP result for {url} looks incomplete, using the browser")
+
+    html = await fetch_page_with_playwright(url)
+    return await asyncio.to_thread(extract_text_from_html, html)
+
+
+def _cap_text(pages, max_bytes: int):
+    """Pass page texts through until max_bytes of UTF-8 have been produced, cutting the last page."""
+    remaining = max_bytes
+    for text in pages:
+        data = text.encode("utf-8")
+        if len(data) >= remaining:
+            yield data[:remaining].decode("utf-8", errors="ignore")
+            return
+        remaining -= len(data)
+        yield text
+
+
+def _open_pdf(source: Union[str, bytes]) -> fitz.Document:
+    """Open a PDF from a file path or from its raw bytes, without touching the disk for the latter."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def iter_pdf_pages(pdf_path: Union[str, bytes], max_pages: int = PDF_MAX_PAGES, max_bytes: int = PDF_MAX_TEXT_BYTES):
+    """Yield the text of each PDF page in order, in this process, within the page and byte caps."""
+    def pages():
+        with _open_pdf(pdf_path) as doc:
+            for index in range(min(len(doc), max_pages)):
+                yield doc[index].get_text()
+
+    yield from _cap_text(pages(), max_bytes)
+
+
+def extract_text_from_pdf(pdf_path: Union[str, bytes], max_pages: int = PDF_MAX_PAGES, max_bytes: int = PDF_MAX_TEXT_BYTES) -> str:
+    """Extract text from a PDF file or in-memory PDF bytes."""
+    return "".join(iter_pdf_pages(pdf_path, max_pages, max_bytes))
+
+
+def _extract_page_range(pdf_path: Union[str, bytes], start: int, stop: int) -> list:
+    # Runs in a worker process, so each task opens its own document handle
+    with _open_pdf(pdf_path) as doc:
+        return [doc[index].get_text() for index in range(start, stop)]
+
+
+def _count_pdf_pages(pdf_path: Union[str, bytes]) -> int:
+    with _open_pdf(pdf_path) as doc:
+        return len(doc)
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        # spawn, not fork: the bot process has running threads that must not be forked
+        _pdf_executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_executor
+
+
+def shutdown_pdf_workers():
+    global _pdf_executor
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(cancel_futures=True)
+        _pdf_executor = None
+
+
+async def aiter_pdf_pages(pdf_path: Union[str, bytes], max_pages: int = PDF_MAX_PAGES, max_bytes: int = PDF_MAX_TEXT_BYTES):
     """
-    Extracts text from a URL (rendered HTML) or local PDF file.
+    Async generator of PDF page texts in order. Page ranges are extracted in parallel by
+    worker processes, pages are yielded as soon as their range (and all earlier ones) is done.
     """
-    if isinstance(input_data, str) and is_valid_url(input_data):
-        html = await fetch_page_with_playwright(input_data)  # <-- await here
-        return extract_text_from_html(html)  # no need for await, sync func
+    loop = asyncio.get_running_loop()
+    page_count = min(await asyncio.to_thread(_count_pdf_pages, pdf_path), max_pages)
+
+    # In-memory PDFs are copied to the worker with every task, so split them into one range per worker
+    pages_per_task = PDF_PAGES_PER_TASK
+    if not isinstance(pdf_path, str):
+        pdf_path = bytes(pdf_path)
+        pages_per_task = max(PDF_PAGES_PER_TASK, -(-page_count // PDF_WORKERS))
+
+    executor = get_pdf_executor()
+    futures = [
+        loop.run_in_executor(executor, _extract_page_range, pdf_path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    remaining = max_bytes
+    try:
+        for future in futures:
+            for text in await future:
+                data = text.encode("utf-8")
+                if len(data) >= remaining:
+                    yield data[:remaining].decode("utf-8", errors="ignore")
+                    return
+                remaining -= len(data)
+                yield text
+    finally:
+        for future in futures:
+            future.cancel()  # byte cap reached or consumer stopped early
+
+
+async def extract_text_from_pdf_async(pdf_path: Union[str, bytes], max_pages: int = PDF_MAX_PAGES, max_bytes: int = PDF_MAX_TEXT_BYTES) -> str:
+    return "".join([text async for text in aiter_pdf_pages(pdf_path, max_pages, max_bytes)])
+
+
+async def extract_text(input_data: Union[str, bytes, BinaryIO]) -> str:
+    """
+    Extracts text from a URL (rendered HTML), a local PDF file, or PDF bytes / a binary stream.
+    """
+    if hasattr(input_data, "read"):
+        input_data = input_data.read()
+
+    if isinstance(input_data, (bytes, bytearray, memoryview)):
+        return await extract_text_from_pdf_async(bytes(input_data))
+    elif isinstance(input_data, str) and is_valid_url(input_data):
+        return await fetch_page_text(input_data)
     elif isinstance(input_data, str) and input_data.lower().endswith('.pdf'):
-        # PDF extraction is sync, so just call it directly
-        return extract_text_from_pdf(input_data)
+        return await extract_text_from_pdf_async(input_data)
     else:
-        raise ValueError("Unsupported input: must be a valid URL or a PDF file path")
+        raise ValueError("Unsupported input: must be a valid URL, a PDF file path or PDF bytes")
 
 
 # Example usage
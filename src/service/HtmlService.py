@@ -0,0 +1,242 @@
+import logging
+import re
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger("HomeBotLogger")
+
+# Never part of the readable content
+BOILERPLATE_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "form", "button",
+    "nav", "aside",
+}
+# Page chrome at page level, but the headline and byline of an <article> or <main>
+SECTION_TAGS = {"header", "footer"}
+CONTENT_TAGS = {"article", "main"}
+# class/id words of navigation, cookie banners, share bars and similar page chrome
+BOILERPLATE_ATTR_PATTERN = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|menu|breadcrumbs?|footer|header|sidebar|cookies?|consent|gdpr|banner|"
+    r"share|social|subscribe|newsletter|related|comments?|advert|ads|promo|popup|modal)(?:$|[\s_-])",
+    re.I,
+)
+MIN_PARAGRAPH_CHARS = 25
+MIN_MAIN_CONTENT_CHARS = 200
+# lxml refuses str input that declares its own encoding (XHTML pages)
+XML_DECLARATION_PATTERN = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+class _LxmlBackend:
+    name = "lxml"
+
+    def parse(self, html: str):
+        return lxml.html.document_fromstring(XML_DECLARATION_PATTERN.sub("", html, count=1))
+
+    def elements(self, root):
+        return (el for el in root.iter() if isinstance(el.tag, str))
+
+    def tag(self, el) -> str:
+        return el.tag.lower()
+
+    def attr(self, el, name: str) -> str:
+        return el.get(name) or ""
+
+    def remove(self, el):
+        el.drop_tree()
+
+    def find(self, root, tag: str):
+        return list(root.iter(tag))
+
+    def text(self, el) -> str:
+        return " ".join(" ".join(el.itertext()).split())
+
+    def parent(self, el):
+        return el.getparent()
+
+    def key(self, el):
+        return el
+
+
+class _SelectolaxBackend:
+    name = "selectolax"
+
+    def parse(self, html: str):
+        return HTMLParser(html).root
+
+    def elements(self, root):
+        return root.traverse()
+
+    def tag(self, el) -> str:
+        return el.tag
+
+    def attr(self, el, name: str) -> str:
+        return el.attributes.get(name) or ""
+
+    def remove(self, el):
+        el.decompose()
+
+    def find(self, root, tag: str):
+        return root.css(tag)
+
+    def text(self, el) -> str:
+        return " ".join(el.text(separator=" ").split())
+
+    def parent(self, el):
+        return el.parent
+
+    def key(self, el):
+        return el.mem_id
+
+
+class _BeautifulSoupBackend:
+    # Pure-Python fallback, always available
+    name = "bs4"
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, "html.parser")
+
+    def elements(self, root):
+        return root.find_all(True)
+
+    def tag(self, el) -> str:
+        return el.name
+
+    def attr(self, el, name: str) -> str:
+        value = el.get(name) or ""
+        return " ".join(value) if isinstance(value, list) else value
+
+    def remove(self, el):
+        el.decompose()
+
+    def find(self, root, tag: str):
+        return root.find_all(tag)
+
+    def text(self, el) -> str:
+        return " ".join(el.get_text(" ").split())
+
+    def parent(self, el):
+        return el.parent
+
+    def key(self, el):
+        return id(el)
+
+
+# Fastest available first
+HTML_BACKENDS = {}
+if HTMLParser is not None:
+    HTML_BACKENDS["selectolax"] = _SelectolaxBackend()
+if lxml is not None:
+    HTML_BACKENDS["lxml"] = _LxmlBackend()
+HTML_BACKENDS["bs4"] = _BeautifulSoupBackend()
+
+DEFAULT_HTML_BACKEND = next(iter(HTML_BACKENDS))
+
+
+def _inside_content(backend, el) -> bool:
+    parent = backend.parent(el)
+    while parent is not None:
+        if backend.tag(parent) in CONTENT_TAGS:
+            return True
+        parent = backend.parent(parent)
+    return False
+
+
+def _is_boilerplate(backend, el) -> bool:
+    tag = backend.tag(el)
+    if tag in BOILERPLATE_TAGS:
+        return True
+    if tag in SECTION_TAGS:
+        return not _inside_content(backend, el)
+    if tag in ("html", "body", "main", "article"):
+        return False  # page-level classes like "page-header-fixed" say nothing about the content
+    if backend.attr(el, "role") in ("navigation", "banner", "contentinfo", "dialog"):
+        return True
+    return bool(BOILERPLATE_ATTR_PATTERN.search(f"{backend.attr(el, 'class')} {backend.attr(el, 'id')}"))
+
+
+def _strip_boilerplate(backend, root):
+    # Decide everything first, then remove outermost matches only: removing a node
+    # inside an already removed subtree is invalid for some backends
+    marked = {backend.key(el): el for el in backend.elements(root) if _is_boilerplate(backend, el)}
+    for el in list(marked.values()):
+        ancestor = backend.parent(el)
+        while ancestor is not None and backend.key(ancestor) not in marked:
+            ancestor = backend.parent(ancestor)
+        if ancestor is None:
+            backend.remove(el)
+
+
+def _headline(backend, root) -> str:
+    # The first <h1> left after stripping the chrome, else the document <title>
+    for tag in ("h1", "title"):
+        for el in backend.find(root, tag):
+            text = backend.text(el)
+            if text:
+                return text
+    return ""
+
+
+def _with_headline(backend, root, text: str) -> str:
+    # The selected block is often the body next to the <h1>, not the element holding both
+    headline = _headline(backend, root)
+    return f"{headline} {text}" if headline and headline not in text else text
+
+
+def _main_content(backend, root) -> str:
+    # Explicit content containers win when they hold enough text
+    containers = backend.find(root, "article") + backend.find(root, "main")
+    if containers:
+        text = max((backend.text(el) for el in containers), key=len)
+        if len(text) >= MIN_MAIN_CONTENT_CHARS:
+            return _with_headline(backend, root, text)
+
+    # Readability-style: score each block by the paragraph text it holds, half for grandparents
+    scores, nodes = {}, {}
+    for paragraph in backend.find(root, "p"):
+        length = len(backend.text(paragraph))
+        if length < MIN_PARAGRAPH_CHARS:
+            continue
+        parent = backend.parent(paragraph)
+        for weight in (1.0, 0.5):
+            if parent is None:
+                break
+            key = backend.key(parent)
+            scores[key] = scores.get(key, 0) + length * weight
+            nodes[key] = parent
+            parent = backend.parent(parent)
+
+    if scores:
+        text = backend.text(nodes[max(scores, key=scores.get)])
+        if len(text) >= MIN_MAIN_CONTENT_CHARS:
+            return _with_headline(backend, root, text)
+    return backend.text(root)
+
+
+def extract_text_from_html(html: str, backend: str = None, main_content: bool = True) -> str:
+    """
+    Extract readable text from raw HTML.
+    Page chrome (navigation, headers, footers, cookie banners...) is dropped and, with main_content,
+    only the block holding the article text is kept.
+    """
+    if not html or not html.strip():
+        return ""
+    parser = HTML_BACKENDS[backend or DEFAULT_HTML_BACKEND]
+    try:
+        root = parser.parse(html)
+    except Exception as e:
+        if parser.name == "bs4":
+            raise
+        # The pure-Python parser takes anything the faster ones reject
+        logger.warning(f"{parser.name} could not parse the page, using bs4: {e}")
+        parser = HTML_BACKENDS["bs4"]
+        root = parser.parse(html)
+    _strip_boilerplate(parser, root)
+    return _main_content(parser, root) if main_content else parser.text(root)
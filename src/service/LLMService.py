@@ -2,20 +2,22 @@ import locale
 import tiktoken
 import asyncio
 import requests
+import httpx
+import json
 import re
-import nltk
+import hashlib
+import multiprocessing
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
 
-nltk.download('punkt')
-nltk.download('stopwords')
-
-
-from openai import OpenAI
 from babel.dates import format_date, format_time
 from datetime import datetime
-from src.service.CredentialsService import get_credential
-
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize,RegexpTokenizer
+from src.service.CredentialsService import get_credential, get_config
+from src.service.AsyncDBService import get_cached_response, put_cached_response
 import logging
 
 logger = logging.getLogger("HomeBotLogger")
@@ -30,15 +32,40 @@ if not logger.hasHandlers():
     logger.addHandler(console_handler)
 
 
-GPT_KEY = get_credential("GPT_KEY")
-
-client = OpenAI(api_key=GPT_KEY)
-
-OLLAMA_URL = get_credential("LOCAL_LLM_URL")
-MODEL_NAME = get_credential("LLM_MODEL")
-DEFAULT_MODEL = "gpt-4"
+DEFAULT_MODEL = "gpt-4"            # backend of users who never ran /select_model
+SELECTABLE_MODELS = ("gpt-4", "local")
+MODEL_ALIASES = {"gpt": "gpt-4"}
 MAX_TOKENS_ALLOWED = 30000
 MAX_LEN = 500
+CLEAN_WINDOW_CHARS = 64 * 1024
+CLEAN_IN_PROCESS_CHARS = 100_000   # shorter texts are cleaned in place, a worker round-trip costs more
+WORD_PATTERN = re.compile(r"\w+")
+WHITESPACE_PATTERN = re.compile(r"\s")
+
+# Bundled stopword lists, used when no NLTK data is installed (python ProvisionNltk.py installs it)
+NLTK_FALLBACK_DATA = Path(__file__).resolve().parents[1] / "resources" / "nltk_data"
+NLTK_RESOURCES = ("stopwords",)
+SUMMARY_CHUNK_TOKENS = MAX_TOKENS_ALLOWED // 4   # map step input, leaves room for prompt and answer
+SUMMARY_BATCH_WORDS = 200          # chunks are packed from word batches of this size
+SUMMARY_CONCURRENCY = 4            # chunk summaries of one text requested at the same time
+SUMMARY_MAX_DEPTH = 3              # reduce rounds before the merged summaries are sent as they are
+SUMMARY_CHUNK_ATTEMPTS = 2         # a chunk answered with an error is asked again, then the summary fails
+CHUNK_SUMMARY_CACHE_SIZE = 512
+FAILED_ANSWER_PREFIXES = ("❌", "⚠️")  # answers starting like this are errors and never cached
+LLM_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)  # read timeout is per chunk: a local model may think long
+LLM_QUEUE_TIMEOUT = 300.0          # longest wait for a free backend slot before the request fails
+# Requests a backend serves at the same time, across all users. Ollama runs few generations in parallel.
+BACKEND_CONCURRENCY = {"gpt-4": 8, "local": 2, "fake": 8}
+
+_text_executor = None
+_openai_client = None
+_openai_key = None
+_async_openai_client = None
+_async_openai_key = None
+_llm_http_client = None
+_backend_slots = {}
+_backend_stats = {}
+_chunk_summaries = OrderedDict()
 
 LANG_MAP = {
     "ru": "russian",
@@ -48,53 +75,138 @@ LANG_MAP = {
 def get_nltk_language_code(lang: str) -> str:
     return LANG_MAP.get(lang.lower(), "english")  # Default to English if unknown
 
-def clean_and_trim_text(text: str, lang: str = "en", max_tokens: int = MAX_TOKENS_ALLOWED, model: str = DEFAULT_MODEL):
-    # Token counting
+
+@lru_cache(maxsize=None)
+def get_encoder(model: str = DEFAULT_MODEL):
+    """tiktoken encoder for a model, loaded once per model."""
     try:
-        enc = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        enc = tiktoken.get_encoding("cl100k_base")
+        return tiktoken.get_encoding("cl100k_base")
 
-    dirty_tokens = enc.encode(text)
 
-    # Normalize whitespace
-    text_arr = text.split()
-    logger.info(f"Before whitespace trim {len(text_arr)}")
+def _nltk():
+    # nltk takes about a quarter of a second to import, so it is imported on first use
+    import nltk
+    if str(NLTK_FALLBACK_DATA) not in nltk.data.path:
+        nltk.data.path.append(str(NLTK_FALLBACK_DATA))
+    return nltk
 
-    text = ' '.join(text_arr)
-    token_lang = get_nltk_language_code(lang)
 
-    # Tokenize (fallback to RegexpTokenizer if needed)
+@lru_cache(maxsize=None)
+def get_stopwords(token_lang: str) -> frozenset:
+    """NLTK stopwords for a language, read from disk once per language."""
+    _nltk()
+    from nltk.corpus import stopwords
     try:
-        words = word_tokenize(text, language=token_lang)
-    except LookupError:
-        tokenizer = RegexpTokenizer(r'\w+')
-        words = tokenizer.tokenize(text)
+        return frozenset(stopwords.words(token_lang))
+    except (LookupError, OSError):
+        logger.warning(f"No NLTK stopwords for {token_lang}, run python ProvisionNltk.py")
+        return frozenset()
+
+
+def provision_nltk_data(download_dir: str = None) -> bool:
+    """Download the NLTK data the bot uses. One-time setup, never done on import or first use."""
+    nltk = _nltk()
+    ok = all(nltk.download(resource, download_dir=download_dir, quiet=True) for resource in NLTK_RESOURCES)
+    get_stopwords.cache_clear()
+    return ok
+
+
+def warm_up_resources(languages=tuple(LANG_MAP), models=(DEFAULT_MODEL,)):
+    """Load encoders and stopwords up front so the first request doesn't pay for it."""
+    for model in models:
+        try:
+            get_encoder(model)
+        except Exception as e:
+            logger.warning(f"Could not load tiktoken encoder for {model}: {e}")
+    for lang in languages:
+        get_stopwords(get_nltk_language_code(lang))
+
+
+def _iter_windows(text: str, size: int = CLEAN_WINDOW_CHARS):
+    # Slices of about `size` chars, cut at whitespace so no word is split
+    start, length = 0, len(text)
+    while start < length:
+        end = start + size
+        if end < length:
+            match = WHITESPACE_PATTERN.search(text, end)
+            end = match.start() if match else length
+        yield text[start:end]
+        start = end
+
+
+def _clean_text(text: str, lang: str, model: str, count_before: bool):
+    """
+    One pass over the text: split into words, drop stopwords and count tokens window by window.
+    Returns (cleaned_text, token_length, words, kept_words, tokens_before).
+    """
+    enc = get_encoder(model)
+    stop_words = get_stopwords(get_nltk_language_code(lang))
+    tokens_before = len(enc.encode_ordinary(text)) if count_before else None
+
+    parts, token_length, words, kept = [], 0, 0, 0
+    for window in _iter_windows(text):
+        window_words = WORD_PATTERN.findall(window)
+        filtered = [w for w in window_words if w.isalnum() and w.lower() not in stop_words]
+        words += len(window_words)
+        if not filtered:
+            continue
+        kept += len(filtered)
+        part = ' '.join(filtered)
+        # Windows are joined with a space, and the encoders split on the space before a word,
+        # so the per-window counts add up to the count of the whole text
+        token_length += len(enc.encode_ordinary(f" {part}" if parts else part))
+        parts.append(part)
+
+    return ' '.join(parts), token_length, words, kept, tokens_before
+
+
+def _finish_cleaning(result, max_tokens: int):
+    cleaned_text, token_length, words, kept, tokens_before = result
+    logger.info(f"Stop words delete before:{words} after: {kept}")
+    if tokens_before is not None:
+        logger.debug(f"Cleaning result. Tokens before:{tokens_before} after: {token_length}")
+    logger.info(f"Cleaning result. Tokens: {token_length}")
+
+    trimmed = token_length > max_tokens
+    return cleaned_text, trimmed, token_length
 
-    # Remove stopwords and non-alphanumeric words
-    try:
-        stop_words = set(stopwords.words(token_lang))
-    except LookupError:
-        stop_words = set()
 
-    filtered_words = [w for w in words if w.lower() not in stop_words and w.isalnum()]
-    cleaned_text = ' '.join(filtered_words)
+def clean_and_trim_text(text: str, lang: str = "en", max_tokens: int = MAX_TOKENS_ALLOWED, model: str = DEFAULT_MODEL,
+                        count_before: bool = False):
+    """
+    Drop punctuation and stopwords and count the tokens left.
+    Returns (cleaned_text, trimmed, token_length), trimmed tells the text is over max_tokens.
+    count_before also logs the token count of the raw text, at the cost of encoding it.
+    """
+    return _finish_cleaning(_clean_text(text, lang, model, count_before), max_tokens)
 
-    logger.info(f"Stop words delete before:{len(words)} after: {len(filtered_words)}")
 
-    tokens = enc.encode(cleaned_text)
-    token_length = len(tokens)
+def get_text_executor() -> ProcessPoolExecutor:
+    global _text_executor
+    if _text_executor is None:
+        # spawn, not fork: the bot process has running threads that must not be forked
+        _text_executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _text_executor
 
-    logger.info(f"Cleaning result. Tokens before:{len(dirty_tokens)} after: {len(tokens)}")
 
-    if token_length > max_tokens:
-        #trimmed_tokens = tokens[:max_tokens]
-        #cleaned_text = enc.decode(trimmed_tokens)
-        trimmed = True
-    else:
-        trimmed = False
+def shutdown_text_workers():
+    global _text_executor
+    if _text_executor is not None:
+        _text_executor.shutdown(cancel_futures=True)
+        _text_executor = None
+
+
+async def clean_and_trim_text_async(text: str, lang: str = "en", max_tokens: int = MAX_TOKENS_ALLOWED,
+                                    model: str = DEFAULT_MODEL, count_before: bool = False):
+    """clean_and_trim_text for the event loop: long texts are cleaned in a worker process."""
+    if len(text) < CLEAN_IN_PROCESS_CHARS:
+        return clean_and_trim_text(text, lang, max_tokens, model, count_before)
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(get_text_executor(), _clean_text, text, lang, model, count_before)
+    return _finish_cleaning(result, max_tokens)
 
-    return cleaned_text, trimmed, token_length
 
 def escape_markdown(text: str) -> str:
     return escape_markdown_telegram(text)
@@ -125,11 +237,12 @@ def escape_markdown_telegram(text: str) -> str:
     return text
 
 
-def select_model(model_name: str):
-    global DEFAULT_MODEL
-    if model_name not in ("local", "gpt-4"):
-        raise ValueError("model_name must be either 'local' or 'gpt-4'")
-    DEFAULT_MODEL = model_name
+def select_model(model_name: str) -> str:
+    """Validate a /select_model argument and return the backend name to store for the user."""
+    model_name = MODEL_ALIASES.get(model_name, model_name)
+    if model_name not in SELECTABLE_MODELS:
+        raise ValueError(f"model_name must be one of {', '.join(SELECTABLE_MODELS)}")
+    return model_name
 
 
 def get_localized_datetime_babel(lang_code: str):
@@ -139,7 +252,7 @@ def get_localized_datetime_babel(lang_code: str):
     return localized_date, localized_time
 
 
-def get_prompt(querry: str, context: str, pref_lang: str, q_type: str) -> str:
+def get_prompt(querry: str, context: str, pref_lang: str, q_type: str, max_len: int = MAX_LEN) -> str:
     date_str, time_str = get_localized_datetime_babel(pref_lang)
 
     if q_type == "?":
@@ -153,9 +266,13 @@ def get_prompt(querry: str, context: str, pref_lang: str, q_type: str) -> str:
         prompt_part = "Summarize the following transcript focusing on key points, facts, and important names.\n"
 
     if q_type == "sup_sum":
-        prompt_part = (f"Summarize the following transcript to fit in {MAX_LEN} symbols focusing on key points, facts, "
+        prompt_part = (f"Summarize the following transcript to fit in {max_len} symbols focusing on key points, facts, "
                        f"and important names.\n")
 
+    if q_type == "chunk":
+        prompt_part = ("Summarize this part of a longer transcript focusing on key points, facts, and important names. "
+                       "It will be merged with the summaries of the other parts.\n")
+
     prompt = (
         f"CONTEXT: {context}\n\n"
         "CONTEXT SETTINGS: \n"
@@ -178,6 +295,18 @@ def get_prompt(querry: str, context: str, pref_lang: str, q_type: str) -> str:
     return prompt
 
 
+def get_openai_client():
+    """OpenAI client, created on first use and again when a config reload changes the key."""
+    global _openai_client, _openai_key
+    key = get_credential("GPT_KEY")
+    if _openai_client is None or key != _openai_key:
+        from openai import OpenAI  # the package alone takes over half a second to import
+        _openai_client = OpenAI(api_key=key)
+        _openai_key = key
+    return _openai_client
+
+
+# Blocking variants, kept for scripts; the bot goes through complete_response / stream_response
 def get_gpt_response(querry, context, pref_lang, q_type):
     tools = [{"type": "web_search_preview",
               "search_context_size": "low",
@@ -191,7 +320,7 @@ def get_gpt_response(querry, context, pref_lang, q_type):
 
     tools = []
 
-    response = client.responses.create(
+    response = get_openai_client().responses.create(
         model="gpt-4.1",
         #model="gpt-4.1-nano",
         tools=tools,
@@ -205,12 +334,12 @@ def get_gpt_response(querry, context, pref_lang, q_type):
 
 def get_local_response(querry: str, context: str, pref_lang: str, q_type: str) -> str:
     payload = {
-        "model": MODEL_NAME,
+        "model": get_credential("LLM_MODEL"),
         "prompt": get_prompt(querry, context, pref_lang, q_type),
         "stream": False
     }
 
-    response = requests.post(OLLAMA_URL, json=payload)
+    response = requests.post(get_credential("LOCAL_LLM_URL"), json=payload)
     response.raise_for_status()
     data = response.json()
     summary = data.get("response", "⚠️ No response from model.")
@@ -218,34 +347,80 @@ def get_local_response(querry: str, context: str, pref_lang: str, q_type: str) -
     return summary
 
 
-async def generate_response(querry: str, context: str = "", title: str = "", pref_lang: str = "en", p_q_type: str = "?") -> str:
+def response_cache_key(q_type: str, pref_lang: str, context: str, querry: str = "", max_len: int = MAX_LEN,
+                       model: str = None) -> str:
+    """
+    Response cache key: model, prompt type, language, whitespace-normalized context, question and,
+    for sup_sum, the length limit. The date/time lines of get_prompt are left out on purpose.
+    """
+    digest = hashlib.sha256()
+    for part in (get_backend(model).cache_key(), q_type, pref_lang, querry.strip(), str(max_len) if q_type == "sup_sum" else ""):
+        digest.update(part.encode("utf-8") + b"\0")
+    digest.update(' '.join(context.split()).encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def cached_stream(key: str, pieces, use_cache: bool = True):
+    """
+    Serve a streamed answer from the response cache, or pass `pieces` through and cache the complete answer.
+    With use_cache=False the cached answer is skipped and replaced by the new one.
+    """
+    if use_cache:
+        cached = await get_cached_response(key)
+        if cached is not None:
+            logger.info("Answer served from the response cache")
+            yield cached
+            return
+
+    parts = []
+    async for piece in pieces:
+        parts.append(piece)
+        yield piece
+    if parts and not parts[-1].startswith(FAILED_ANSWER_PREFIXES):
+        await put_cached_response(key, "".join(parts))
+
+
+async def generate_response(querry: str, context: str = "", title: str = "", pref_lang: str = "en", p_q_type: str = "?",
+                            use_cache: bool = True, user_id: int = None, model: str = None) -> str:
     result = "⚠️ No response from model."
     try:
         q_type = p_q_type
+        key = response_cache_key(q_type, pref_lang, context, querry, model=model)
+        cached = await get_cached_response(key) if use_cache else None
+        if cached is not None:
+            return escape_markdown(cached)
 
-        if DEFAULT_MODEL == "gpt-4":
-            result = get_gpt_response(querry, context, pref_lang, q_type)
-        else:
-            result = get_local_response(querry, context, pref_lang, q_type)
+        result = await complete_response(querry, context, pref_lang, q_type, user_id=user_id, model=model) or result
 
+        if not result.startswith(FAILED_ANSWER_PREFIXES):
+            await put_cached_response(key, result)
         return escape_markdown(result)
-    except requests.exceptions.RequestException as e:
-        return f"❌ Request failed: {e}"
+    except (httpx.HTTPError, requests.exceptions.RequestException, LLMRequestError) as e:
+        return escape_markdown(f"❌ Request failed: {e}")  # sent as MarkdownV2 like any answer
+    except asyncio.TimeoutError:
+        return escape_markdown("❌ Request failed: the model is busy, please try again later")
 
 
-async def summarize_text(context: str, title: str, pref_lang: str, q_type="sum", max_len: int = MAX_LEN) -> str:
+async def summarize_text(context: str, title: str, pref_lang: str, q_type="sum", max_len: int = MAX_LEN,
+                         use_cache: bool = True, user_id: int = None, model: str = None) -> str:
     MAX_LEN = max_len
 
     result = "⚠️ No response from model."
     try:
-        if DEFAULT_MODEL == "gpt-4":
-            result = summarize_text_gpt(context, pref_lang, q_type)
-        else:
-            result = summarize_text_local(context, pref_lang, q_type)
+        key = response_cache_key(q_type, pref_lang, context, max_len=max_len, model=model)
+        cached = await get_cached_response(key) if use_cache else None
+        if cached is not None:
+            return format_summary(title, cached)
+
+        result = await complete_response("", context, pref_lang, q_type, max_len, user_id, model) or result
 
-        return f"*{escape_markdown(title)}*\n\n*Summary:*\n{escape_markdown(result)}"
-    except requests.exceptions.RequestException as e:
-        return f"❌ Request failed: {e}"
+        if not result.startswith(FAILED_ANSWER_PREFIXES):
+            await put_cached_response(key, result)
+        return format_summary(title, result)
+    except (httpx.HTTPError, requests.exceptions.RequestException, LLMRequestError) as e:
+        return escape_markdown(f"❌ Request failed: {e}")  # sent as MarkdownV2 like any answer
+    except asyncio.TimeoutError:
+        return escape_markdown("❌ Request failed: the model is busy, please try again later")
 
 
 def summarize_text_gpt(context: str, pref_lang: str, q_type: str = "sum") -> str:
@@ -256,6 +431,332 @@ def summarize_text_local(context: str, pref_lang: str, q_type: str = "sum") -> s
     return get_local_response("", context, pref_lang, q_type)
 
 
+def format_summary(title: str, result: str) -> str:
+    return f"*{escape_markdown(title)}*\n\n*Summary:*\n{escape_markdown(result)}"
+
+
+class FairSemaphore:
+    """
+    Semaphore whose free slots go to the waiting users in turn, so a user with many queued
+    requests (a long map-reduce summary) can't hold back the others.
+    """
+
+    def __init__(self, value: int):
+        self._free = value
+        self._waiters = OrderedDict()  # user_id -> deque of futures, in turn order
+
+    async def acquire(self, user_id=None):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as the wait was cancelled
+            else:
+                queue = self._waiters.get(user_id)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._waiters[user_id]
+            raise
+
+    def release(self):
+        while self._waiters:
+            user_id, queue = next(iter(self._waiters.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(user_id)  # back of the line until the other users had a turn
+            else:
+                del self._waiters[user_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+    @asynccontextmanager
+    async def slot(self, user_id=None, timeout: float = None):
+        await asyncio.wait_for(self.acquire(user_id), timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def get_backend_slots(backend: str) -> FairSemaphore:
+    if backend not in _backend_slots:
+        _backend_slots[backend] = FairSemaphore(BACKEND_CONCURRENCY.get(backend, 1))
+    return _backend_slots[backend]
+
+
+def get_async_openai_client():
+    """AsyncOpenAI client, created on first use and again when a config reload changes the key."""
+    global _async_openai_client, _async_openai_key
+    key = get_credential("GPT_KEY")
+    if _async_openai_client is None or key != _async_openai_key:
+        from openai import AsyncOpenAI
+        _async_openai_client = AsyncOpenAI(api_key=key, timeout=LLM_HTTP_TIMEOUT)
+        _async_openai_key = key
+    return _async_openai_client
+
+
+def get_llm_http_client() -> httpx.AsyncClient:
+    global _llm_http_client
+    if _llm_http_client is None:
+        _llm_http_client = httpx.AsyncClient(timeout=LLM_HTTP_TIMEOUT)
+    return _llm_http_client
+
+
+async def close_llm_clients():
+    global _llm_http_client, _async_openai_client
+    if _llm_http_client is not None:
+        await _llm_http_client.aclose()
+        _llm_http_client = None
+    if _async_openai_client is not None:
+        await _async_openai_client.close()
+        _async_openai_client = None
+
+
+class LLMRequestError(Exception):
+    """A model request failed. OpenAI errors are re-raised as this, so callers don't import openai for them."""
+
+
+class _OpenAIBackend:
+    name = "gpt-4"
+    api_model = "gpt-4.1"
+
+    def cache_key(self) -> str:
+        return self.api_model
+
+    async def stream(self, prompt: str):
+        client = get_async_openai_client()
+        from openai import APIError  # timeouts, 429s and 5xx; none of them are httpx errors
+        try:
+            stream = await client.responses.create(
+                model=self.api_model,
+                input=prompt,
+                stream=True,
+                store=True
+            )
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+        except APIError as e:
+            raise LLMRequestError(str(e)) from e
+
+
+class _OllamaBackend:
+    name = "local"
+
+    def cache_key(self) -> str:
+        return f"ollama:{get_credential('LLM_MODEL')}"
+
+    async def stream(self, prompt: str):
+        payload = {
+            "model": get_credential("LLM_MODEL"),
+            "prompt": prompt,
+            "stream": True
+        }
+
+        # Ollama streams one JSON object per line, each holding the next piece of the answer
+        async with get_llm_http_client().stream("POST", get_credential("LOCAL_LLM_URL"), json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    yield f"⚠️ {data['error']}"
+                    return
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    return
+
+
+class _FakeBackend:
+    # Canned answer without network or credentials, for tests and benchmarks
+    name = "fake"
+    n_pieces = 20
+    piece_delay = 0.0
+
+    def cache_key(self) -> str:
+        return self.name
+
+    async def stream(self, prompt: str):
+        yield f"Fake answer to a {len(prompt)}-char prompt."
+        for i in range(self.n_pieces - 1):
+            await asyncio.sleep(self.piece_delay)
+            yield f" piece {i}"
+
+
+# Every backend streams the answer to a prompt; the user's choice is stored in user_context.model
+LLM_BACKENDS = {backend.name: backend for backend in (_OpenAIBackend(), _OllamaBackend(), _FakeBackend())}
+
+
+def get_backend(model: str = None):
+    """Backend for a stored model name; None (no choice yet) and unknown names get DEFAULT_MODEL."""
+    backend = LLM_BACKENDS.get(model or DEFAULT_MODEL)
+    if backend is None:
+        logger.warning(f"Unknown model {model!r}, using {DEFAULT_MODEL}")
+        backend = LLM_BACKENDS[DEFAULT_MODEL]
+    return backend
+
+
+def get_summary_model(model: str = None) -> str:
+    """Backend for the map step of long summaries: SUMMARY_MODEL from config.json, else the user's own."""
+    try:
+        return get_config().get("SUMMARY_MODEL") or model
+    except (OSError, ValueError):
+        return model  # no readable config.json, e.g. offline with the fake backend
+
+
+def get_backend_stats() -> dict:
+    """Per backend: finished requests, failures, streamed chars and seconds spent generating (slot held)."""
+    return {name: dict(stats) for name, stats in _backend_stats.items()}
+
+
+def reset_backend_stats():
+    _backend_stats.clear()
+
+
+async def _stream_backend(querry: str, context: str, pref_lang: str, q_type: str, max_len: int = MAX_LEN,
+                          user_id: int = None, model: str = None):
+    # One backend slot is held for the whole generation, waiting users get slots in turn
+    backend = get_backend(model)
+    prompt = get_prompt(querry, context, pref_lang, q_type, max_len)
+    async with get_backend_slots(backend.name).slot(user_id, LLM_QUEUE_TIMEOUT):
+        stats = _backend_stats.setdefault(backend.name, {"requests": 0, "failures": 0, "chars": 0, "seconds": 0.0})
+        start = time.perf_counter()
+        chars = 0
+        try:
+            async for piece in backend.stream(prompt):
+                chars += len(piece)
+                yield piece
+        except Exception:
+            stats["failures"] += 1
+            raise
+        finally:
+            stats["requests"] += 1
+            stats["chars"] += chars
+            stats["seconds"] += time.perf_counter() - start
+
+
+async def complete_response(querry: str, context: str, pref_lang: str, q_type: str, max_len: int = MAX_LEN,
+                            user_id: int = None, model: str = None) -> str:
+    """The whole answer at once, through the same async clients and backend slots as streaming."""
+    return "".join([piece async for piece in _stream_backend(querry, context, pref_lang, q_type, max_len, user_id, model)])
+
+
+async def stream_response(querry: str, context: str = "", pref_lang: str = "en", q_type: str = "?", max_len: int = MAX_LEN,
+                          user_id: int = None, model: str = None):
+    """
+    Async generator of the raw model answer, piece by piece as the model produces it.
+    Markdown escaping is left to the caller: it can only be done on the complete answer.
+    """
+    try:
+        async for piece in _stream_backend(querry, context, pref_lang, q_type, max_len, user_id, model):
+            yield piece
+    except (httpx.HTTPError, LLMRequestError) as e:
+        yield f"❌ Request failed: {e}"
+    except asyncio.TimeoutError:
+        yield "❌ Request failed: the model is busy, please try again later"
+
+
+def split_into_token_chunks(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS, model: str = DEFAULT_MODEL) -> list:
+    """Split text at word boundaries into chunks of at most about max_tokens tokens."""
+    enc = get_encoder(model)
+    words = text.split()
+    chunks, current, current_tokens = [], [], 0
+    for start in range(0, len(words), SUMMARY_BATCH_WORDS):
+        batch = ' '.join(words[start:start + SUMMARY_BATCH_WORDS])
+        tokens = len(enc.encode_ordinary(f" {batch}"))
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(' '.join(current))
+            current, current_tokens = [], 0
+        current.append(batch)
+        current_tokens += tokens
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+class ChunkSummaryError(LLMRequestError):
+    """A map step chunk got only error answers; merging them would put the error into the summary."""
+
+
+async def summarize_chunk(chunk: str, pref_lang: str, semaphore: asyncio.Semaphore = None, user_id: int = None,
+                          model: str = None) -> str:
+    """Map step: summary of one chunk, cached so /sm and /ssm on the same text share it."""
+    key = hashlib.sha256(f"{get_backend(model).cache_key()}\0{pref_lang}\0{chunk}".encode()).hexdigest()
+    if key in _chunk_summaries:
+        _chunk_summaries.move_to_end(key)
+        return _chunk_summaries[key]
+
+    async with semaphore or asyncio.Semaphore(1):
+        for attempt in range(SUMMARY_CHUNK_ATTEMPTS):
+            summary = await complete_response("", chunk, pref_lang, "chunk", user_id=user_id, model=model)
+            if summary.strip() and not summary.startswith(FAILED_ANSWER_PREFIXES):
+                break
+            logger.warning(f"Chunk summary failed (attempt {attempt + 1}/{SUMMARY_CHUNK_ATTEMPTS}): {summary[:200]}")
+        else:
+            raise ChunkSummaryError(summary.strip() or "⚠️ No response from model.")
+
+    _chunk_summaries[key] = summary
+    if len(_chunk_summaries) > CHUNK_SUMMARY_CACHE_SIZE:
+        _chunk_summaries.popitem(last=False)
+    return summary
+
+
+async def reduce_to_budget(text: str, pref_lang: str, max_tokens: int = MAX_TOKENS_ALLOWED, user_id: int = None,
+                           model: str = None) -> str:
+    """
+    Summarize chunks of the text concurrently and merge the summaries, again and again
+    until the merged text fits in max_tokens (or SUMMARY_MAX_DEPTH rounds are done).
+    """
+    enc = get_encoder(DEFAULT_MODEL)
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    for depth in range(SUMMARY_MAX_DEPTH):
+        chunks = split_into_token_chunks(text)
+        logger.info(f"Map-reduce round {depth + 1}: summarizing {len(chunks)} chunks")
+        tasks = [asyncio.ensure_future(summarize_chunk(chunk, pref_lang, semaphore, user_id, model)) for chunk in chunks]
+        try:
+            text = "\n\n".join(await asyncio.gather(*tasks))
+        except BaseException:
+            # One failed chunk fails the summary, the others would only burn backend slots
+            for task in tasks:
+                task.cancel()
+            raise
+        if len(chunks) == 1 or len(enc.encode_ordinary(text)) <= max_tokens:
+            break
+    return text
+
+
+async def stream_summary(context: str, pref_lang: str, q_type: str = "sum", max_len: int = MAX_LEN,
+                         token_length: int = None, user_id: int = None, model: str = None):
+    """
+    stream_response for summaries of any length: a context over MAX_TOKENS_ALLOWED is first reduced
+    by map-reduce, then the final sum/sup_sum summary is streamed from the merged chunk summaries.
+    The map step runs on get_summary_model(model), the final summary on the user's model.
+    """
+    if token_length is None:
+        token_length = len(get_encoder(DEFAULT_MODEL).encode_ordinary(context))
+    if token_length > MAX_TOKENS_ALLOWED:
+        try:
+            context = await reduce_to_budget(context, pref_lang, user_id=user_id, model=get_summary_model(model))
+        except (httpx.HTTPError, LLMRequestError) as e:
+            yield f"❌ Request failed: {e}"
+            return
+        except asyncio.TimeoutError:
+            yield "❌ Request failed: the model is busy, please try again later"
+            return
+    async for piece in stream_response("", context, pref_lang, q_type, max_len, user_id, model):
+        yield piece
+
+
 def get_mock_text() -> str:
     return """
 Once upon a time in a small village nestled between rolling hills, there lived a young girl named Elara. She was known throughout the village for her curiosity and adventurous spirit. Every day, she would explore the nearby forests and meadows, discovering new plants, animals, and hidden trails.
@@ -334,8 +835,8 @@ if __name__ == "__main__":
     # res = get_gpt_response("Current time","", "ru", "?")
     # res = get_gpt_response("Current time in moscow","", "ru", "?")
 
-    # select_model("local")
-    # res = summarize_text(long_text, 'Foo  title', "ru")
+    # res = asyncio.run(summarize_text(long_text, 'Foo  title', "ru", model="local"))
+    # res = asyncio.run(summarize_text(long_text, 'Foo  title', "ru", model="fake"))
     # res = get_local_response("Current time","",  "ru", "?")
     # res = get_local_response("Current time in moscow","",  "ru", "?")
 
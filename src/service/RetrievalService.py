@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from src.service.LLMService import get_stopwords, get_nltk_language_code
+
+logger = logging.getLogger("HomeBotLogger")
+
+PASSAGE_WORDS = 120            # words per retrievable passage
+PASSAGE_OVERLAP = 20           # words shared with the previous passage, so no fact is cut in half
+RETRIEVAL_TOP_K = 6
+RETRIEVAL_MIN_WORDS = 1500     # smaller contexts are sent whole, retrieval would only lose text
+RETRIEVAL_INDEX_MAX_USERS = 64
+BM25_K1 = 1.5
+BM25_B = 0.75
+TERM_PATTERN = re.compile(r"\w+")
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def split_passages(text: str, size: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP) -> list:
+    words = text.split()
+    step = size - overlap
+    return [' '.join(words[start:start + size]) for start in range(0, max(len(words) - overlap, 1), step)]
+
+
+class BM25Index:
+    """Okapi BM25 over fixed-size passages of one user's saved context."""
+
+    def __init__(self, text: str, lang: str = "en"):
+        self.digest = _digest(text)
+        self.stop_words = get_stopwords(get_nltk_language_code(lang))
+        self.passages = split_passages(text)
+        self.postings = {}
+        self.lengths = []
+        for doc_id, passage in enumerate(self.passages):
+            terms = self._terms(passage)
+            self.lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, count))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        n = len(self.passages)
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in self.postings.items()}
+
+    def _terms(self, text: str) -> list:
+        return [t for t in TERM_PATTERN.findall(text.lower()) if t not in self.stop_words]
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> list:
+        """Indices of the k best matching passages, best first."""
+        scores = {}
+        for term in set(self._terms(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, count in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def build_index(user_id: int, text: str, lang: str = "en") -> BM25Index:
+    """(Re)build the user's index."""
+    index = BM25Index(text, lang or "en")
+    with _lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        if len(_indexes) > RETRIEVAL_INDEX_MAX_USERS:
+            _indexes.popitem(last=False)
+    logger.debug(f"Retrieval index for user {user_id}: {len(index.passages)} passages, {len(index.postings)} terms")
+    return index
+
+
+def get_index(user_id: int, text: str, lang: str = "en") -> BM25Index:
+    """The user's index for exactly this text, rebuilt when the saved context changed or after a restart."""
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+    if index is None or index.digest != _digest(text):
+        index = build_index(user_id, text, lang)
+    return index
+
+
+def invalidate_index(user_id: int = None):
+    with _lock:
+        if user_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(user_id, None)
+
+
+def select_context(user_id: int, question: str, text: str, lang: str = "en", k: int = RETRIEVAL_TOP_K) -> str:
+    """
+    The part of the saved context worth sending with a question: the top-k BM25 passages in
+    their original order, the first k passages when nothing matches, or the whole text when it is short.
+    """
+    if len(text.split()) <= RETRIEVAL_MIN_WORDS:
+        return text
+    index = get_index(user_id, text, lang)
+    hits = index.search(question, k) or range(min(k, len(index.passages)))
+    return "\n...\n".join(index.passages[doc_id] for doc_id in sorted(hits))
+
+
+# Example usage
+if __name__ == "__main__":
+    sample = " ".join(f"filler sentence number {i} about nothing in particular." for i in range(400))
+    sample += " The Kalan is the best animal and lives by the sea. " + sample
+    print(select_context(1, "Which animal is the best?", sample))
@@ -1,8 +1,14 @@
+import asyncio
+import html
+import json
 import logging
+import random
 import re
 import requests
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, CouldNotRetrieveTranscript
 from urllib.parse import urlparse, parse_qs
+from src.service.AsyncDBService import get_cached_transcript, put_cached_transcript
+from src.service.DBService import get_cached_video_title, put_cached_video_title
 
 logger = logging.getLogger("HomeBotLogger")
 logger.setLevel(logging.DEBUG)
@@ -12,6 +18,14 @@ import re
 from urllib.parse import urlparse, parse_qs
 
 YOUTUBE_ID_PATTERN = re.compile(r"^[\w-]{11}$")
+TITLE_PATTERN = re.compile(r"<title>(.*?)(?: - YouTube)?</title>", re.DOTALL)
+
+OEMBED_URL = "https://www.youtube.com/oembed?format=json&url=https://www.youtube.com/watch?v={video_id}"
+WATCH_URL = "https://www.youtube.com/watch?v={video_id}"
+TITLE_READ_LIMIT = 256 * 1024  # give up on the watch page if <title> isn't within this many bytes
+HTTP_TIMEOUT = 10
+
+_session = requests.Session()
 
 def get_video_id(url_or_id):
     """
@@ -46,38 +60,113 @@ def get_video_id(url_or_id):
     raise ValueError("Invalid YouTube URL or video ID")
 
 
-def get_video_title(video_id):
-    url = f"https://www.youtube.com/watch?v={video_id}"
-    resp = requests.get(url)
-    if resp.status_code == 200:
-        match = re.search(r"<title>(.*?) - YouTube</title>", resp.text)
-        if match:
-            return match.group(1)
+def parse_oembed_title(payload: str) -> str:
+    """Title from a YouTube oEmbed JSON response."""
+    try:
+        return (json.loads(payload).get("title") or "").strip()
+    except (ValueError, AttributeError):
+        return ""
+
+
+def parse_watch_page_title(page_head: str):
+    """
+    Title from the beginning of a watch page.
+    Returns None while the closing </title> hasn't been received yet.
+    """
+    match = TITLE_PATTERN.search(page_head)
+    if not match:
+        return None
+    return html.unescape(match.group(1)).strip()
+
+
+def _fetch_oembed_title(video_id) -> str:
+    resp = _session.get(OEMBED_URL.format(video_id=video_id), timeout=HTTP_TIMEOUT)
+    if resp.status_code != 200:
+        return ""
+    return parse_oembed_title(resp.text)
+
+
+def _fetch_watch_page_title(video_id) -> str:
+    # Stream the page and stop reading as soon as the <title> is complete
+    with _session.get(WATCH_URL.format(video_id=video_id), stream=True, timeout=HTTP_TIMEOUT) as resp:
+        if resp.status_code != 200:
+            return ""
+        head = b""
+        for block in resp.iter_content(chunk_size=8192):
+            head += block
+            title = parse_watch_page_title(head.decode("utf-8", errors="ignore"))
+            if title is not None:
+                return title
+            if len(head) >= TITLE_READ_LIMIT:
+                break
     return ""
 
+
+def get_video_title(video_id):
+    """
+    Resolve the video title: persistent cache first, then the few-KB oEmbed endpoint,
+    then the head of the watch page. Blocking, call it from a worker thread.
+    """
+    title = get_cached_video_title(video_id)
+    if title is not None:
+        return title
+
+    try:
+        title = _fetch_oembed_title(video_id) or _fetch_watch_page_title(video_id)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Title lookup failed for {video_id}: {e}")
+        return ""
+
+    if title:
+        put_cached_video_title(video_id, title)
+    return title
+
 def contains_cyrillic(text):
     return bool(re.search('[\u0400-\u04FF]', text))
-import time
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, CouldNotRetrieveTranscript
 
+LIST_ATTEMPTS = 3
+
+
+async def fetch_transcript(video_id, lang):
+    # Cached under the language actually fetched, so users with different /sl settings share one entry
+    cached = await get_cached_transcript(video_id)
+    if cached is not None:
+        logger.debug(f"Transcript cache hit for {video_id} ({cached['selected_language']})")
+        return cached
+
+    result = await _fetch_transcript(video_id, lang)
+    # Only successful fetches are cached, errors are retried on the next request
+    if result["text"] and result["selected_language"] in result["available_languages"]:
+        await put_cached_transcript(video_id, result["selected_language"], result)
+    return result
 
-def fetch_transcript(video_id, lang):
-    title = get_video_title(video_id)
+
+async def _list_transcripts(video_id):
+    # The transcript API is blocking, so every attempt runs in a worker thread
+    for attempt in range(LIST_ATTEMPTS):
+        try:
+            return await asyncio.to_thread(YouTubeTranscriptApi().list, video_id)
+        except Exception as e:
+            logger.warning(f"Attempt {attempt+1}/{LIST_ATTEMPTS} failed: {e}")
+            if attempt < LIST_ATTEMPTS - 1:
+                # exponential backoff with jitter, so retries of many users don't line up
+                await asyncio.sleep(2 ** attempt + random.uniform(0, 1))
+    return None
+
+
+async def _fetch_transcript(video_id, lang):
+    # Title lookup and transcript listing are independent, run them at the same time
+    title, transcript_list = await asyncio.gather(
+        asyncio.to_thread(get_video_title, video_id),
+        _list_transcripts(video_id),
+    )
     logger.debug(f"Video title: {title}")
 
     langs = ["en", "ru"]
     if contains_cyrillic(title):
         langs = ["ru", "en"]
 
-    transcript_list = None
-    for attempt in range(3):
-        try:
-            transcript_list = YouTubeTranscriptApi().list(video_id)
-            break
-        except Exception as e:
-            logger.warning(f"Attempt {attempt+1}/3 failed: {e}")
-            time.sleep(2 ** attempt)  # exponential backoff
-
     if transcript_list is None:
         errMsg = "Failed to retrieve transcript list after retries."
         logger.error(errMsg)
@@ -105,7 +194,7 @@ def fetch_transcript(video_id, lang):
                 "title": title
             }
 
-        transcript = transcript_obj.fetch()
+        transcript = await asyncio.to_thread(transcript_obj.fetch)
         full_text = "\n".join(entry.text for entry in transcript)
 
         return {